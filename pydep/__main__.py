@@ -1,60 +1,251 @@
+import logging
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from packaging.version import Version
-import tomli
 import typer
-from typer import FileText
 
-from pydep import costs
-from pydep import opts
-from pydep.algorithms import AlgorithmsAvailable, logger as algo_logger
+from pydep.algorithms import AlgorithmsAvailable
 import pydep.algorithms as algos
+from pydep.batch import iter_cases, objectives, run_batch, solve_virtual, virtual_solver
 from pydep.depsmgr import Pip
-from pydep.logs import configure_logger, stream_logger
-from pydep.parser import parse_virtual_config
-from pydep.tests import DockerPyRunner, LinearRunner, TestCmdsEnum
+from pydep.logs import LogLevels, setup_logging
+from pydep.parser import load_virtual_config
+from pydep.metrics import metrics
+from pydep.opts import NotSolutionException
+from pydep.tests import DEFAULT_FAIL_PATTERNS, EarlyStop
+from pydep.tests import ExternalRunnersEnum, TestCmdsEnum
+from pydep.versions import read_pins
 import pydep.tests as runners
-from pydep.tests import logger as tests_logger
-from pydep.vercache import VersionsCache
 
-logger = stream_logger(__name__)
-configure_logger(tests_logger)
-configure_logger(algo_logger)
+# modules pulling docker, httpx or pep517 are imported only by the commands
+# that need them, see stats/importtime.py
+
+logger = logging.getLogger(__name__)
 
 app = typer.Typer()
 
 
+PARETO_HELP = "Search the front of the newest versions against the fewest changed pins, printing a line per point."
+
+
+def check_pareto(algorithm: AlgorithmsAvailable, pareto: bool):
+    if pareto and not getattr(algos, algorithm).pareto:
+        supported = [a.value for a in AlgorithmsAvailable if getattr(algos, a).pareto]
+        raise typer.BadParameter(
+            f"Pareto optimization works with {', '.join(supported)}",
+            param_hint="--algorithm",
+        )
+
+
+@app.callback()
+def main(
+    log_level: LogLevels = typer.Option(
+        LogLevels.info.value, help="Minimum level of the messages to log."
+    ),
+    log_json: Optional[Path] = typer.Option(
+        None, help="Also write the log as JSON lines, one event per line, to this file."
+    ),
+    metrics_path: Optional[Path] = typer.Option(
+        None,
+        "--metrics",
+        help="Collect counters and timings of the run and write them as JSON to this file at exit.",
+    ),
+):
+    setup_logging(logging.getLevelName(log_level.value), log_json)
+
+    if metrics_path is not None:
+        metrics.enable(metrics_path)
+
+
+def no_solution() -> typer.Exit:
+    typer.secho("No versions passing the tests were found", fg=typer.colors.RED)
+    return typer.Exit(1)
+
+
 @app.command()
 def virtual(
-    testcase: FileText,
+    testcase: Path = typer.Argument(
+        ...,
+        exists=True,
+        dir_okay=False,
+        help="TOML testcase, or a JSON lines one, *.case.jsonl, with the dependencies on the first line and a test per line after.",
+    ),
     algorithm: AlgorithmsAvailable = typer.Option(
         AlgorithmsAvailable.backtrack.value, help="Algorithm to use"
     ),
     iterations: int = typer.Option(
         100, help="Iterations to run the selected algorithm (if applies)"
     ),
+    seed: int = typer.Option(0, help="Seed of the algorithm's random choices."),
+    pareto: bool = typer.Option(False, help=PARETO_HELP),
 ):
-    d = tomli.loads(testcase.read())
-    deps, tests, inivers = parse_virtual_config(d)
-
-    mapping = {}
-    for dep, ver in zip(deps, inivers):
-        mapping[dep] = ver
-
-    algo = getattr(algos, algorithm)
-
-    solver = algo(
-        deps,
-        LinearRunner(tests),
-        costs.Sum(costs.version_to_float),
-        opts.Max(),
-        inimapping=mapping,
-        iterations=iterations,
+    check_pareto(algorithm, pareto)
+
+    try:
+        config = load_virtual_config(testcase)
+    except ValueError as err:
+        raise typer.BadParameter(str(err), param_hint="TESTCASE")
+
+    if not pareto:
+        try:
+            print(solve_virtual(config, algorithm, iterations, seed))
+        except NotSolutionException:
+            raise no_solution()
+
+        return
+
+    solver = virtual_solver(config, algorithm, iterations, seed, pareto)
+    solver.run()
+
+    for point in solver.optimizer.front:  # type: ignore
+        print(point)
+
+
+@app.command()
+def batch(
+    cases: Path = typer.Argument(
+        ...,
+        help="Directory of TOML and *.case.jsonl testcases, one of those, or a JSON lines file with a testcase per line ('-' reads stdin).",
+    ),
+    algorithm: AlgorithmsAvailable = typer.Option(
+        AlgorithmsAvailable.backtrack.value, help="Algorithm to use"
+    ),
+    iterations: int = typer.Option(
+        100, help="Iterations to run the selected algorithm (if applies)"
+    ),
+    workers: Optional[int] = typer.Option(
+        None, help="Worker processes, the default is the number of CPUs."
+    ),
+    seed: int = typer.Option(
+        0, help="Seed from which the seed of each testcase derives."
+    ),
+):
+    """
+    Solve many virtual testcases in a pool of processes, writing a JSON line
+    with the result and timing of each case as soon as it finishes.
+    """
+
+    if str(cases) != "-" and not cases.exists():
+        raise typer.BadParameter(f"{cases} does not exist", param_hint="CASES")
+
+    errors = run_batch(
+        iter_cases(cases), algorithm, iterations, workers=workers, seed=seed
     )
-    resp = solver.run()
 
-    print(resp)
+    if errors:
+        logger.warning("%d testcase(s) failed", errors)
+        raise typer.Exit(1)
+
+
+@app.command()
+def bench(
+    cases: Optional[Path] = typer.Argument(
+        None,
+        exists=True,
+        help="Directory of TOML and *.case.jsonl testcases, one of those, or a JSON lines file with a testcase per line.",
+    ),
+    suite: Optional[str] = typer.Option(
+        None, help="Benchmark a generated suite instead of CASES, see `generate`."
+    ),
+    algorithm: List[AlgorithmsAvailable] = typer.Option(
+        list(AlgorithmsAvailable), help="Algorithms to benchmark"
+    ),
+    budget: List[int] = typer.Option([100], help="Iteration budgets to try"),
+    seeds: int = typer.Option(1, help="Runs of each job with different seeds"),
+    workers: Optional[int] = typer.Option(
+        None, help="Worker processes, the default is the number of CPUs."
+    ),
+    trace_memory: bool = typer.Option(
+        False, help="Measure the peak memory of each job (slows jobs down)."
+    ),
+    csv_path: Optional[Path] = typer.Option(
+        None, "--csv", help="Write the result of every job as CSV to this file."
+    ),
+    json_path: Optional[Path] = typer.Option(
+        None, "--json", help="Write every result and the summary as JSON to this file."
+    ),
+):
+    """
+    Benchmark algorithms over a suite of virtual testcases in a pool of
+    processes, one job per algorithm, budget, testcase and seed.
+    """
+
+    from pydep import bench as bm
+    from pydep import workloads
+
+    if (cases is None) == (suite is None):
+        raise typer.BadParameter("Give either CASES or --suite")
+
+    if suite is not None:
+        if suite not in workloads.SUITES:
+            raise typer.BadParameter(
+                f"Unknown suite, choose from {', '.join(workloads.SUITES)}",
+                param_hint="--suite",
+            )
+
+        tsets = [w.to_dict() for _, w in workloads.suite(suite)]
+
+    else:
+        tsets = []
+        for name, what in iter_cases(cases):  # type: ignore
+            if isinstance(what, str):
+                raise typer.BadParameter(
+                    f"Testcase {name} isn't a JSON object", param_hint="CASES"
+                )
+
+            tsets.append(what)
+
+    algos_names = [algo.value for algo in algorithm]
+    results = list(
+        bm.run_benchmark(tsets, algos_names, budget, seeds, workers, trace_memory)
+    )
+
+    if csv_path is not None:
+        bm.write_csv(results, csv_path)
+
+    if json_path is not None:
+        bm.write_json(results, json_path)
+
+    for algo, per_budget in bm.summarize(results).items():
+        for it, d in per_budget.items():
+            line = (
+                f"{algo:>10} {it:>6}: success {100 * d['success_rate']:6.2f}%, "
+                f"{d['evaluations']} evaluations, {d['time']:.3f}s, "
+                f"{d['evals_per_sec']:.0f} evals/s"
+            )
+
+            if d["peak_memory"] is not None:
+                line += f", peak {d['peak_memory'] / 2**20:.1f} MiB"
+
+            typer.echo(line)
+
+
+@app.command()
+def generate(
+    suite: str = typer.Argument(
+        ..., help="Suite to generate: small, medium, large or huge."
+    ),
+    outdir: Path = typer.Argument(
+        ..., file_okay=False, help="Directory where to write the TOML testcases."
+    ),
+    jsonl_tests: bool = typer.Option(
+        False, help="Write the tests of each testcase apart, as JSON lines."
+    ),
+):
+    """
+    Write the seeded testcases of a generated suite of virtual testcases.
+    """
+
+    from pydep import workloads
+
+    if suite not in workloads.SUITES:
+        raise typer.BadParameter(
+            f"Unknown suite, choose from {', '.join(workloads.SUITES)}",
+            param_hint="SUITE",
+        )
+
+    workloads.write_suite(suite, outdir, jsonl_tests)
 
 
 @app.command()
@@ -89,13 +280,90 @@ def dockerpy(
     iterations: int = typer.Option(
         100, help="Iterations to run the selected algorithm (if applies)"
     ),
+    seed: int = typer.Option(0, help="Seed of the algorithm's random choices."),
+    pareto: bool = typer.Option(False, help=PARETO_HELP),
     only_top_level: bool = typer.Option(
         True, help="Use only top level dependencies to install"
     ),
+    pin_transitive: bool = typer.Option(
+        False,
+        help="With only top level dependencies, pin the rest to versions compatible with each candidate, resolved locally from the releases' cached metadata.",
+    ),
     cache_min_year: int = typer.Option(
         2018, help="Minimum year to admit for a version"
     ),
+    exclude: List[str] = typer.Option(
+        [],
+        help="Pattern, in .dockerignore syntax, of files to leave out of the build context.",
+    ),
+    runner_kind: ExternalRunnersEnum = typer.Option(
+        ExternalRunnersEnum.image.value,
+        "--runner",
+        help="Build an image per candidate, or apply candidates in place in long-lived containers or local venvs (trusted projects only).",
+    ),
+    workers: Optional[int] = typer.Option(
+        None,
+        help="Candidates of a batch, for algorithms evaluating batches, to run at the same time, by default the total capacity of the docker hosts; for container and venv runners, containers or venvs to keep, by default 1.",
+    ),
+    docker_host: List[str] = typer.Option(
+        [],
+        metavar="URL[#CAPACITY]",
+        help="Docker daemon, e.g. tcp://10.0.0.2:2375#4, to build and run candidates on, taking CAPACITY (by default 1) at a time; repeat it to spread them over several. The default is the daemon of the environment.",
+    ),
+    max_builds: Optional[int] = typer.Option(
+        None, help="Candidate builds to run at the same time on each docker host."
+    ),
+    max_tests: Optional[int] = typer.Option(
+        None, help="Test containers to run at the same time on each docker host."
+    ),
+    memory: Optional[str] = typer.Option(
+        None, help="Memory limit, e.g. 2g, of each build and test container."
+    ),
+    cpus: Optional[float] = typer.Option(
+        None, help="CPUs each build and test container may use."
+    ),
+    image_budget: Optional[str] = typer.Option(
+        None,
+        help="Disk, e.g. 20g, the candidate images may take on each docker host, beyond which the least recently used ones are removed; the rest are removed at the end.",
+    ),
+    good_pins: Optional[Path] = typer.Option(
+        None,
+        exists=True,
+        dir_okay=False,
+        help="Requirements file, e.g. an old `pip freeze`, of versions known to pass, for Bisect; the default is the oldest versions.",
+    ),
+    fail_pattern: List[str] = typer.Option(
+        [],
+        help="Regular expression of output lines stopping a test run as failed, it replaces the defaults (import errors of pytest and unittest).",
+    ),
+    test_timeout: Optional[float] = typer.Option(
+        None, help="Seconds after which a test run fails."
+    ),
+    incremental: bool = typer.Option(
+        False,
+        help="Search only what may do better since the last incremental search with the same settings: dependencies with new versions, more if the project changed; from its optimum, replaying the mappings evaluated while the project is unchanged.",
+    ),
+    affected_only: int = typer.Option(
+        0,
+        metavar="MAX_CHANGES",
+        help="For candidates changing at most MAX_CHANGES dependencies of a passing one, run only the test files importing them (0 runs every test).",
+    ),
 ):
+    check_pareto(algorithm, pareto)
+
+    if incremental and pareto:
+        raise typer.BadParameter(
+            "An incremental search keeps a single optimum", param_hint="--pareto"
+        )
+
+    if pin_transitive and not only_top_level:
+        raise typer.BadParameter(
+            "Every dependency is already searched", param_hint="--pin-transitive"
+        )
+
+    from pydep import snapshot
+    from pydep.dockerpy import DockerPyRunner
+
     cmd = getattr(runners, test_runner)(test_cmd)
 
     args = [] if not extras else extras.split(",")
@@ -104,33 +372,126 @@ def dockerpy(
     if img_basename is None:
         img_basename = path.stem
 
-    runner = DockerPyRunner(path, depsmgr, [cmd], img_basename, pytag)
-    mapping = runner.init_deps_mapping(
-        top_level=only_top_level, cache_min_year=cache_min_year
+    from pydep.hosts import DockerHost, NoHostAvailable
+    from pydep.scheduler import Limits
+
+    hosts = [DockerHost.parse(spec) for spec in docker_host]
+    limits = Limits(max_builds, max_tests, memory, cpus, image_budget)
+
+    if workers is None:
+        workers = sum(host.capacity for host in hosts) if hosts else 1
+
+    runner = DockerPyRunner(
+        path, depsmgr, [cmd], img_basename, pytag, exclude, workers, hosts, limits
     )
 
-    logger.debug(mapping)
+    if runner_kind == ExternalRunnersEnum.container:
+        slots = snapshot.container_slots(runner, workers)
+        runner = snapshot.SnapshotRunner(path, depsmgr, [cmd], slots)
 
-    if not bypass_ivers:
-        result = runner.run_all(mapping)
+    elif runner_kind == ExternalRunnersEnum.venv:
+        slots = snapshot.venv_slots(path, workers)
+        runner = snapshot.SnapshotRunner(path, depsmgr, [cmd], slots)
 
-        if all(result):
-            typer.secho("All tests passed with initial versions", fg=typer.colors.GREEN)
-            return
+    runner.early_stop = EarlyStop(fail_pattern or DEFAULT_FAIL_PATTERNS, test_timeout)
 
-    algo = getattr(algos, algorithm)
+    inc = None
+    if incremental:
+        from pydep.incremental import Incremental
 
-    solver = algo(
-        list(mapping),
-        runner,
-        costs.Sum(costs.version_to_float),
-        opts.Max(),
-        iterations=iterations,
-        inimapping=mapping,
-    )
+        setup = [str(path), test_cmd or test_runner.value, extras or "", pytag]
+        setup += [str(only_top_level), str(pin_transitive)]
+        inc = Incremental(path, setup, excludes=exclude)
+        inc.refresh_versions(cache_min_year)
+
+    try:
+        mapping = runner.init_deps_mapping(
+            top_level=only_top_level,
+            cache_min_year=cache_min_year,
+            transitive=pin_transitive,
+        )
+
+        logger.debug(mapping)
+
+        if affected_only > 0:
+            from pydep.affected import PROBE, TestSelector
+
+            runner.selector = TestSelector.from_probe(
+                path, runner.probe(PROBE), affected_only
+            )
+
+        plan = None
+        search_runner, deps, inimapping = runner, list(mapping), mapping
+
+        if inc is not None:
+            plan = inc.plan(mapping, runner)
+            search_runner, deps, inimapping = plan.runner, plan.deps, plan.inimapping
+
+        # an incremental search starts from the previous optimum instead
+        if not bypass_ivers and (inc is None or inc.previous is None):
+            result = search_runner.run_all(mapping)
+
+            if all(result):
+                typer.secho(
+                    "All tests passed with initial versions", fg=typer.colors.GREEN
+                )
+
+                if inc is not None:
+                    inc.save(mapping, mapping, runner.pyver or "")
+
+                return
+
+        goodmapping = None
+        if good_pins is not None:
+            goodmapping = read_pins(good_pins, mapping)
+            goodmapping = {dep: goodmapping[dep] for dep in deps}
+
+        algo = getattr(algos, algorithm)
+        cost_func, optimizer = objectives(mapping, pareto)
+
+        if plan is not None and not plan.deps:
+            typer.secho(
+                "Nothing that could improve the previous optimum changed",
+                fg=typer.colors.GREEN,
+            )
+            resp = (cost_func(plan.full({})), plan.full({}))
+
+        else:
+            solver = algo(
+                deps,
+                search_runner,
+                cost_func,
+                optimizer,
+                iterations=iterations,
+                inimapping=inimapping,
+                goodmapping=goodmapping,
+                seed=seed,
+            )
+
+            try:
+                resp = solver.run()
+            except NotSolutionException:
+                raise no_solution()
+
+        if plan is not None:
+            full = plan.full(resp[1])  # type: ignore
+            resp = (cost_func(full), full)
+            inc.save(mapping, full, runner.pyver or "")  # type: ignore
+
+    except NoHostAvailable as err:
+        # no verdict, so nothing of the search is worth keeping
+        typer.secho(str(err), fg=typer.colors.RED)
+        raise typer.Exit(1)
+
+    finally:
+        runner.close()
+
+    if not pareto:
+        typer.echo(resp)
+        return
 
-    resp = solver.run()
-    typer.echo(resp)
+    for point in optimizer.front:  # type: ignore
+        typer.echo(point)
 
 
 @app.command()
@@ -140,6 +501,7 @@ def update_versions(
         2018, help="Minimum year to admit for a version"
     ),
 ):
+    from pydep.vercache import VersionsCache
 
     versions_cache = VersionsCache(Version(pyver), loyear=cache_min_year)
     deps = versions_cache.cached_deps()
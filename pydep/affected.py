@@ -0,0 +1,285 @@
+"""
+Selection of the tests affected by a change of dependency versions.
+
+`ImportIndex` statically analyses, once per project, which top level modules
+each test module ends up importing, following imports of the project's own
+modules. Combined with which modules each installed distribution provides
+and what it requires (see `PROBE`), it tells which tests may behave
+differently when some dependencies change. `TestSelector` uses it to only
+run those tests when a candidate is close to a mapping that already passed.
+"""
+
+import ast
+from collections import deque
+import json
+import logging
+from pathlib import Path
+import re
+import threading
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Set
+
+from packaging.utils import canonicalize_name
+
+from pydep.versions import VersionMapping
+
+logger = logging.getLogger(__name__)
+
+# python code printing, as JSON, the top level modules and requirements of
+# every distribution installed in the environment running it
+PROBE = """
+import json
+from importlib import metadata
+
+res = {}
+for dist in metadata.distributions():
+    top = (dist.read_text("top_level.txt") or "").split()
+    if not top:
+        for f in dist.files or []:
+            if len(f.parts) == 1 and f.suffix == ".py":
+                top.append(f.stem)
+            elif len(f.parts) > 1 and not f.parts[0].endswith((".dist-info", ".egg-info", "..")):
+                top.append(f.parts[0])
+    res[dist.metadata["Name"]] = {"modules": sorted(set(top)), "requires": dist.requires or []}
+
+print(json.dumps(res))
+"""
+
+SKIP_DIRS = {"venv", "build", "dist", "node_modules", "__pycache__"}
+
+_REQ_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def _python_files(root: Path) -> Iterator[Path]:
+    for path in sorted(root.iterdir()):
+        if path.name.startswith(".") or path.name in SKIP_DIRS:
+            continue
+
+        if path.is_dir():
+            yield from _python_files(path)
+
+        elif path.suffix == ".py":
+            yield path
+
+
+def _is_test(path: Path) -> bool:
+    return path.name.startswith("test_") or path.stem.endswith("_test")
+
+
+def _imports(path: Path, module: str) -> Set[str]:
+    """Dotted names imported by the file `path` of module `module`."""
+
+    try:
+        tree = ast.parse(path.read_bytes(), str(path))
+    except (SyntaxError, ValueError):
+        logger.warning("Can't parse %s, ignoring its imports", path)
+        return set()
+
+    package = module.split(".")
+    if path.name != "__init__.py":
+        package = package[:-1]
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+
+            if node.level:
+                parent = package[: len(package) - node.level + 1]
+                base = ".".join(parent + ([base] if base else []))
+
+            if base:
+                names.add(base)
+
+            names.update(f"{base}.{alias.name}".strip(".") for alias in node.names)
+
+    return names
+
+
+class ImportIndex:
+    """
+    Which top level modules, not belonging to the project, each test file of
+    `project` imports directly or through the project's modules.
+    `distributions` is the output of running `PROBE` in the test environment.
+    """
+
+    def __init__(self, project: Path, distributions: Dict[str, dict]) -> None:
+        self.project = project
+
+        # module of the project -> file, and back
+        self.local: Dict[str, Path] = {}
+        self.modules: Dict[Path, str] = {}
+        roots = [project] + [project / "src"] * (project / "src").is_dir()
+
+        for root in roots:
+            for path in _python_files(root):
+                parts = list(path.relative_to(root).with_suffix("").parts)
+
+                if parts[-1] == "__init__":
+                    parts.pop()
+
+                if parts and path not in self.modules:
+                    self.local.setdefault(".".join(parts), path)
+                    self.modules[path] = ".".join(parts)
+
+        self.tests: Dict[str, Set[str]] = {}
+        for path in self.modules:
+            if _is_test(path):
+                self.tests[str(path.relative_to(project))] = self._closure(path)
+
+        # top level module -> distributions providing it, and distribution
+        # -> distributions requiring it
+        self.providers: Dict[str, Set[str]] = {}
+        self.dependents: Dict[str, Set[str]] = {}
+
+        for name, info in distributions.items():
+            dist = canonicalize_name(name)
+
+            for module in info["modules"]:
+                self.providers.setdefault(module, set()).add(dist)
+
+            for req in info["requires"]:
+                match = _REQ_NAME.match(req)
+
+                if match:
+                    required = canonicalize_name(match.group(1))
+                    self.dependents.setdefault(required, set()).add(dist)
+
+        self.known = {canonicalize_name(name) for name in distributions}
+
+    def _resolve(self, name: str) -> List[str]:
+        """Local modules that importing `name` executes."""
+
+        parts = name.split(".")
+        prefixes = (".".join(parts[:i]) for i in range(1, len(parts) + 1))
+        return [prefix for prefix in prefixes if prefix in self.local]
+
+    def _closure(self, test: Path) -> Set[str]:
+        seeds = [test]
+
+        # conftest.py files apply to every test below them
+        for parent in test.parents:
+            conftest = parent / "conftest.py"
+
+            if conftest.exists():
+                seeds.append(conftest)
+
+            if parent == self.project:
+                break
+
+        external = set()
+        seen = set(seeds)
+        queue = deque(seeds)
+
+        while queue:
+            path = queue.popleft()
+
+            for name in _imports(path, self.modules.get(path, "")):
+                local = self._resolve(name)
+
+                if not local:
+                    external.add(name.split(".")[0])
+                    continue
+
+                for module in local:
+                    mpath = self.local[module]
+
+                    if mpath not in seen:
+                        seen.add(mpath)
+                        queue.append(mpath)
+
+        return external
+
+    def affected_modules(self, dists: Sequence[str]) -> Optional[Set[str]]:
+        """
+        Top level modules whose behaviour may change when the distributions
+        `dists` change, including modules of distributions requiring them.
+        None if some distribution is unknown.
+        """
+
+        pending = deque(canonicalize_name(dist) for dist in dists)
+
+        if any(dist not in self.known for dist in pending):
+            return None
+
+        affected = set(pending)
+        while pending:
+            for dependent in self.dependents.get(pending.popleft(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+
+        return {
+            module
+            for module, providers in self.providers.items()
+            if providers & affected
+        }
+
+    def tests_for(self, dists: Sequence[str]) -> Optional[List[str]]:
+        """Test files affected by changes of `dists`, None meaning all of them."""
+
+        modules = self.affected_modules(dists)
+
+        if modules is None:
+            return None
+
+        return [test for test, imported in self.tests.items() if imported & modules]
+
+
+class TestSelector:
+    """
+    Remembers mappings where every test passed, a candidate differing from
+    one of them in at most `max_changes` dependencies only runs the tests
+    affected by those. Candidates may be evaluated from several threads.
+    """
+
+    def __init__(
+        self, index: ImportIndex, max_changes: int = 3, remember: int = 64
+    ) -> None:
+        self.index = index
+        self.max_changes = max_changes
+        self.passing: Deque[VersionMapping] = deque(maxlen=remember)
+        self.lock = threading.Lock()
+
+    def select(self, pinned_vers: VersionMapping) -> Optional[List[str]]:
+        """
+        Test files to run for `pinned_vers`, None meaning all of them. Only to
+        be asked once `pinned_vers` is installed: no test file means that no
+        test imports anything that changed, so they pass as they did.
+        """
+
+        with self.lock:
+            passing = list(self.passing)
+
+        best = None
+        for mapping in passing:
+            changed = [
+                dep.name for dep, ver in pinned_vers.items() if mapping.get(dep) != ver
+            ]
+
+            if best is None or len(changed) < len(best):
+                best = changed
+
+        if best is None or len(best) > self.max_changes:
+            return None
+
+        tests = self.index.tests_for(best)
+        logger.debug("Changed %s, affected tests: %s", best, tests)
+
+        return tests
+
+    def record(self, pinned_vers: VersionMapping, results: Sequence[bool]):
+        if all(results):
+            with self.lock:
+                self.passing.append(pinned_vers.copy())
+
+    @classmethod
+    def from_probe(
+        cls, project: Path, probe_output: str, max_changes: int = 3
+    ) -> "TestSelector":
+        index = ImportIndex(project, json.loads(probe_output))
+        logger.info("Indexed the imports of %d test files", len(index.tests))
+
+        return cls(index, max_changes)
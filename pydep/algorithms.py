@@ -1,28 +1,37 @@
 import bisect
+from collections import deque
 import enum
 import logging
-from math import exp
+from itertools import compress, product, repeat
+from math import dist, exp
 import random
-from typing import Optional, Sequence
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
 
 from pydep import opts
 from pydep.costs import CostFunction
 from pydep.deps import Dependency
 from pydep.tests import TestRunner
-from pydep.versions import VersionMapping
+from pydep.versions import Version, VersionMapping
 
 logger = logging.getLogger(__name__)
-random.seed(0)  # debug
 
 
 class AlgorithmsAvailable(str, enum.Enum):
     backtrack = "Backtrack"
     random = "Random"
     simann = "SimAnn"
+    adaptive_simann = "AdaptiveSimAnn"
     pso = "PSO"
+    bisect = "Bisect"
+    surrogate = "Surrogate"
+    genetic = "Genetic"
+    tabu = "Tabu"
 
 
 class Algorithm:
+    # whether it works with `opts.Pareto`, given tuples of costs it only relaxes
+    pareto = False
+
     def __init__(
         self,
         deps: Sequence[Dependency],
@@ -35,6 +44,12 @@ class Algorithm:
         self.runner = runner
         self.cost_func = cost_func
         self.optimizer = optimizer
+        # every solver draws from its own stream, `rng` or else one of `seed`
+        self.rng: random.Random = kwargs.get("rng")
+        if self.rng is None:
+            self.rng = random.Random(kwargs.get("seed", 0))
+        # 1 if the optimizer looks for the highest costs, -1 for the lowest
+        self._sense = -1 if isinstance(optimizer, opts.Min) else 1
 
     def run(self) -> opts.AlgorithmOutput:
         """
@@ -44,9 +59,39 @@ class Algorithm:
 
         raise NotImplementedError
 
+    # mappings as rank vectors, the index of the version of each dependency in
+    # its `spversions`
+
+    def random_vec(self) -> Tuple[int, ...]:
+        return tuple(self.rng.randrange(len(dep.spversions)) for dep in self.deps)
+
+    def unseen_vec(
+        self, seen: Callable[[Tuple[int, ...]], bool], tries: int = 100
+    ) -> Optional[Tuple[int, ...]]:
+        """A random rank vector not `seen` yet, None if none is left."""
+
+        for _ in range(tries):
+            vec = self.random_vec()
+
+            if not seen(vec):
+                return vec
+
+        # so crowded that it's cheaper to look for one in order
+        sizes = [range(len(dep.spversions)) for dep in self.deps]
+        return next((vec for vec in product(*sizes) if not seen(vec)), None)
+
+    def to_vec(self, mapping: VersionMapping) -> Tuple[int, ...]:
+        return tuple(
+            bisect.bisect_left(dep.spversions, mapping[dep]) for dep in self.deps
+        )
+
+    def to_mapping(self, vec: Sequence[int]) -> VersionMapping:
+        return {dep: dep.spversions[i] for dep, i in zip(self.deps, vec)}
+
 
 class Backtrack(Algorithm):
     desc_name = "Backtracking"
+    pareto = True
 
     class StopBacktrack(Exception):
         pass
@@ -59,7 +104,7 @@ class Backtrack(Algorithm):
         optimizer: opts.Optimizer,
         **kwargs,
     ) -> None:
-        super().__init__(deps, runner, cost_func, optimizer)
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
         self.iterations = kwargs.get("iterations", 1000)
 
     def run(self):
@@ -91,6 +136,7 @@ class Backtrack(Algorithm):
 
 class Random(Algorithm):
     desc_name = "Randomized"
+    pareto = True
 
     def __init__(
         self,
@@ -100,23 +146,23 @@ class Random(Algorithm):
         optimizer: opts.Optimizer,
         **kwargs,
     ) -> None:
-        super().__init__(deps, runner, cost_func, optimizer)
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
         self.iterations = kwargs.get("iterations", 1000)
 
     def run(self):
         logger.info("Starting Random algorithm")
 
         for it in range(self.iterations):
-            logger.debug(f"On iteration {it}")
+            logger.debug("On iteration %d", it)
 
             pinned = {}
             for dep in self.deps:
-                ver = random.choice(dep.spversions)
+                ver = self.rng.choice(dep.spversions)
                 pinned[dep] = ver
 
             if all(self.runner.run_all(pinned)):
                 cost = self.cost_func(pinned)
-                logger.debug(f"Succeded with cost={cost}")
+                logger.debug("Succeded with cost=%s", cost, extra={"cost": cost})
                 self.optimizer.relax(cost, pinned.copy())
 
         return self.optimizer.optimum
@@ -151,7 +197,7 @@ class SimAnn(Algorithm):
             temp = 2 - (x + 1) / self.iterations
             snew = self.random_neighbor(s)
 
-            if snew is None or random.random() < self.prob_restart:
+            if snew is None or self.rng.random() < self.prob_restart:
                 logger.debug("Restarting")
                 s = self.random_mapping(s)
                 continue
@@ -159,12 +205,12 @@ class SimAnn(Algorithm):
             if not all(self.runner.run_all(snew)):
                 continue
 
-            logger.debug(f"{snew} is a factible state")
+            logger.debug("%s is a factible state", snew)
 
             new_cost = self._delta * self.cost_func(snew)
             self.optimizer.relax(new_cost, snew.copy())
 
-            if self.prob(cur, new_cost, temp) >= random.random():
+            if self.prob(cur, new_cost, temp) >= self.rng.random():
                 s = snew
                 cur = new_cost
 
@@ -183,7 +229,7 @@ class SimAnn(Algorithm):
         resp = mapping.copy()
 
         for dep in mapping:
-            resp[dep] = random.choice(dep.spversions)
+            resp[dep] = self.rng.choice(dep.spversions)
 
         return resp
 
@@ -201,7 +247,7 @@ class SimAnn(Algorithm):
         if not cands:
             return None
 
-        target = random.choice(cands)
+        target = self.rng.choice(cands)
 
         rmap = mapping.copy()
         assert target[0] in rmap
@@ -211,6 +257,126 @@ class SimAnn(Algorithm):
         return rmap
 
 
+class AdaptiveSimAnn(SimAnn):
+    """
+    `SimAnn` with a schedule adapted to the costs and to the search:
+
+    - worsenings are measured in units of the median absolute cost change
+      between the last `window` pairs of passing states compared, so the
+      temperature means the same whatever the scale of the costs;
+    - the temperature cools geometrically from `t0` to `t_end` over the
+      budget, and is multiplied by `reheat` whenever less than `min_accept`
+      of the last `window` worsenings were accepted;
+    - after `patience` moves without a new best, it restarts from a random
+      state at `t0`, instead of restarting at random all the time; from a
+      failing state it restarts right away, as its neighbours are seldom
+      likelier to pass than random states.
+
+    Results are memoized, so going back to a state costs no evaluation.
+    """
+
+    desc_name = "AdaptiveSimAnn"
+
+    def __init__(
+        self,
+        deps: Sequence[Dependency],
+        runner: TestRunner,
+        cost_func: CostFunction,
+        optimizer: opts.Optimizer,
+        **kwargs,
+    ) -> None:
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
+        self.t0: float = kwargs.get("t0", 1.0)
+        self.t_end: float = kwargs.get("t_end", 0.01)
+        self.window: int = kwargs.get("window", 20)
+        self.min_accept: float = kwargs.get("min_accept", 0.05)
+        self.reheat: float = kwargs.get("reheat", 4.0)
+        self.patience: int = kwargs.get("patience", max(30, 2 * len(deps)))
+
+        self.evaluations = 0
+        self.memo: Dict[Tuple[Version, ...], bool] = {}
+
+    def passes(self, mapping: VersionMapping) -> bool:
+        key = tuple(mapping.values())
+
+        if key not in self.memo:
+            self.evaluations += 1
+            self.memo[key] = all(self.runner.run_all(mapping))
+
+            if self.memo[key]:
+                self.optimizer.relax(self._delta * self.cost_func(mapping), mapping)
+
+        return self.memo[key]
+
+    def restart(
+        self, mapping: VersionMapping
+    ) -> Tuple[VersionMapping, Optional[float]]:
+        """A random state and its cost, None if it fails."""
+
+        s = self.random_mapping(mapping)
+        return s, self._delta * self.cost_func(s) if self.passes(s) else None
+
+    def run(self):
+        s = self.inimapping
+        cur = self._delta * self.cost_func(s) if self.passes(s) else None
+
+        cooling = (self.t_end / self.t0) ** (1 / max(self.iterations, 1))
+        temp = self.t0
+        changes: Deque[float] = deque(maxlen=self.window)
+        accepted: Deque[bool] = deque(maxlen=self.window)
+        best, stale = self.optimizer.opt, 0
+
+        # moves to states known to fail cost nothing, so bound them too
+        steps = 0
+        while self.evaluations < self.iterations and steps < 50 * self.iterations:
+            steps += 1
+            before = self.evaluations
+            snew = self.random_neighbor(s)
+
+            if snew is None or cur is None or stale >= self.patience:
+                logger.debug("Restarting")
+                s, cur = self.restart(s)
+                temp, stale = self.t0, 0
+                accepted.clear()
+                continue
+
+            if self.passes(snew):
+                new_cost = self._delta * self.cost_func(snew)
+
+                if new_cost <= cur:
+                    s, cur = snew, new_cost
+
+                else:
+                    changes.append(new_cost - cur)
+                    scale = sorted(changes)[len(changes) // 2]
+                    accept = self.rng.random() < exp(-(new_cost - cur) / scale / temp)
+                    accepted.append(accept)
+
+                    if accept:
+                        s, cur = snew, new_cost
+
+                    if (
+                        len(accepted) == self.window
+                        and sum(accepted) < self.min_accept * self.window
+                    ):
+                        logger.debug("Reheating from %s", temp)
+                        temp = min(temp * self.reheat, self.t0)
+                        accepted.clear()
+
+            spent = self.evaluations - before
+            temp *= cooling**spent
+
+            if self.optimizer.opt != best:
+                best, stale = self.optimizer.opt, 0
+            else:
+                stale += 1
+
+        if self.optimizer.opt is not None:
+            self.optimizer.opt *= self._delta
+
+        return self.optimizer.optimum
+
+
 class PSO(Algorithm):
     desc_name = "PSO"
 
@@ -222,7 +388,7 @@ class PSO(Algorithm):
         optimizer: opts.Optimizer,
         **kwargs,
     ) -> None:
-        super().__init__(deps, runner, cost_func, optimizer)
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
         self.inimapping: VersionMapping = kwargs["inimapping"]
         self.particles = kwargs.get("particles", 10)
         self.iterations = kwargs.get("iterations", 100)
@@ -242,7 +408,7 @@ class PSO(Algorithm):
         for _ in range(self.particles - 1):
             x = []
             for dep in self.deps:
-                x.append(random.uniform(0, len(dep.spversions) - 1))
+                x.append(self.rng.uniform(0, len(dep.spversions) - 1))
 
             xs.append(x)
 
@@ -251,23 +417,23 @@ class PSO(Algorithm):
         opt_cls = self.optimizer.__class__
 
         for x in xs:
-            logger.debug(f"vec: {x}")
+            logger.debug("vec: %s", x)
 
             v = []
             for dep in self.deps:
                 lo, up = 0, len(dep.spversions) - 1
-                v.append(random.uniform(-(up - lo), up - lo))
+                v.append(self.rng.uniform(-(up - lo), up - lo))
 
-            logger.debug(f"speed = {v}")
+            logger.debug("speed = %s", v)
             vs.append(v)
 
             mp = self.float_to_mapping(x)
             p.append(opt_cls())
 
             if all(self.runner.run_all(mp)):
-                logger.debug(f"mapping = {mp.items()}")
+                logger.debug("mapping = %s", mp)
                 cost = self.cost_func(mp)
-                logger.debug(f"tests succeeded, cost = {cost}")
+                logger.debug("tests succeeded, cost = %s", cost)
                 p[-1].relax(cost, x)
                 self.optimizer.relax(cost, x)  # type: ignore
 
@@ -277,13 +443,13 @@ class PSO(Algorithm):
             xsnew = []
             for i, x in enumerate(xs):
                 for d in range(len(x)):
-                    r_p = random.random()
-                    r_g = random.random()
+                    r_p = self.rng.random()
+                    r_g = self.rng.random()
 
                     lo, up = (0, len(self.deps[d].spversions) - 1)
                     r = (lo, up)
-                    delta_i = random.uniform(*r)
-                    delta_glob = random.uniform(*r)
+                    delta_i = self.rng.uniform(*r)
+                    delta_glob = self.rng.uniform(*r)
 
                     if p[i].mapping is not None:
                         delta_i = p[i].mapping[d] - x[d]
@@ -303,7 +469,7 @@ class PSO(Algorithm):
                     nx = val + vs[i][d]
 
                     if nx < lo - 0.5 or nx > up + 0.4:
-                        nx = random.uniform(lo, up)
+                        nx = self.rng.uniform(lo, up)
 
                     newx.append(nx)
 
@@ -313,7 +479,7 @@ class PSO(Algorithm):
 
                 if all(self.runner.run_all(mp)):
                     cost = self.cost_func(mp)
-                    logger.debug(f"tests succeeded, cost = {cost}")
+                    logger.debug("tests succeeded, cost = %s", cost)
                     p[i].relax(cost, newx)
                     self.optimizer.relax(cost, newx)  # type: ignore
 
@@ -331,3 +497,532 @@ class PSO(Algorithm):
             res[self.deps[i]] = self.deps[i].spversions[dx]
 
         return res
+
+
+class Bisect(Algorithm):
+    """
+    Delta debugging between a mapping known to pass, `goodmapping` (the
+    oldest versions by default), and the failing `inimapping`: ddmin over
+    the dependencies that differ finds a minimal set of culprits, then a
+    binary search over the `spversions` of each one finds the last version
+    that still passes. The answer keeps every other dependency as in
+    `inimapping` and each culprit at its last passing version; if that still
+    fails, because of changes that only break together with the culprits,
+    it bisects again from there. If `goodmapping` fails too, it bisects from
+    the first passing mapping a random search finds instead.
+    """
+
+    desc_name = "Bisect"
+    pareto = True
+
+    class StopBisect(Exception):
+        pass
+
+    def __init__(
+        self,
+        deps: Sequence[Dependency],
+        runner: TestRunner,
+        cost_func: CostFunction,
+        optimizer: opts.Optimizer,
+        **kwargs,
+    ) -> None:
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
+        self.inimapping: VersionMapping = kwargs["inimapping"]
+        goodmapping = kwargs.get("goodmapping") or {}
+        # only versions in `spversions` are searched, the known good ones too,
+        # so the one a search starts from is the one verified to pass
+        self.goodmapping: VersionMapping = {
+            dep: self.snap(dep, goodmapping.get(dep, dep.spversions[0])) for dep in deps
+        }
+        self.iterations = kwargs.get("iterations", 1000)
+        self.memo: Dict[tuple, bool] = {}
+        # the failing mapping being bisected
+        self.target: VersionMapping = {}
+        # culprit -> (last passing version, first failing version)
+        self.culprits: Dict[Dependency, Tuple[Version, Version]] = {}
+
+    def run(self):
+        try:
+            self._run()
+        except Bisect.StopBisect:
+            logger.info("Bisect ran out of evaluations")
+
+        return self.optimizer.optimum
+
+    @staticmethod
+    def snap(dep: Dependency, ver: Version) -> Version:
+        """
+        `ver` if it is one of the `spversions` of `dep`, else the newest one
+        older than it, or the oldest one.
+        """
+
+        i = bisect.bisect_right(dep.spversions, ver)
+        snapped = dep.spversions[max(i - 1, 0)]
+
+        if snapped != ver:
+            logger.warning("Bisecting %s from %s instead of %s", dep.name, snapped, ver)
+
+        return snapped
+
+    def passes(self, mapping: VersionMapping) -> bool:
+        key = tuple(mapping[dep] for dep in self.deps)
+
+        if key not in self.memo:
+            if len(self.memo) >= self.iterations:
+                raise Bisect.StopBisect()
+
+            self.memo[key] = all(self.runner.run_all(mapping))
+
+            if self.memo[key]:
+                self.optimizer.relax(self.cost_func(mapping), mapping.copy())
+
+        return self.memo[key]
+
+    def apply(self, changes: Sequence[Dependency]) -> VersionMapping:
+        """`goodmapping` with the versions of `target` for `changes`."""
+
+        mapping = {dep: self.goodmapping[dep] for dep in self.deps}
+        for dep in changes:
+            mapping[dep] = self.target[dep]
+
+        return mapping
+
+    def _run(self):
+        self.target = {dep: self.inimapping[dep] for dep in self.deps}
+
+        if self.passes(self.target):
+            logger.info("The initial versions pass, nothing to bisect")
+            return
+
+        if not self.passes(self.apply([])):
+            logger.warning("The known good versions fail too, looking for others")
+            self.goodmapping = self.find_good()
+
+        # every round moves a culprit to a version older than its target, and
+        # fixing one may fix the others too, so it bisects again after each
+        while not self.passes(self.target):
+            changes = [
+                dep for dep in self.deps if self.goodmapping[dep] != self.target[dep]
+            ]
+            culprits = self.ddmin(changes)
+            logger.debug("Culprits: %s", culprits)
+
+            dep = culprits[0]
+            last, first = self.search(dep, self.apply(culprits[1:]))
+            self.culprits[dep] = (last, first)
+            self.target[dep] = last
+
+            logger.debug("%s breaks from %s, last passing %s", dep.name, first, last)
+
+    def find_good(self) -> VersionMapping:
+        """Random mappings not evaluated yet, up to the first that passes."""
+
+        def seen(vec: Tuple[int, ...]) -> bool:
+            return (
+                tuple(dep.spversions[i] for dep, i in zip(self.deps, vec)) in self.memo
+            )
+
+        while True:
+            vec = self.unseen_vec(seen)
+
+            if vec is None:
+                raise Bisect.StopBisect()
+
+            mapping = self.to_mapping(vec)
+
+            if self.passes(mapping):
+                return mapping
+
+    def ddmin(self, changes: List[Dependency]) -> List[Dependency]:
+        """A 1-minimal subset of `changes` that still makes the tests fail."""
+
+        n = 2
+        while len(changes) >= 2:
+            size = -(-len(changes) // n)
+            chunks = [changes[i : i + size] for i in range(0, len(changes), size)]
+
+            for chunk in chunks:
+                if not self.passes(self.apply(chunk)):
+                    changes, n = chunk, 2
+                    break
+
+            else:
+                for chunk in chunks if n > 2 else ():
+                    rest = [dep for dep in changes if dep not in chunk]
+
+                    if not self.passes(self.apply(rest)):
+                        changes, n = rest, max(n - 1, 2)
+                        break
+
+                else:
+                    if n >= len(changes):
+                        break
+
+                    n = min(2 * n, len(changes))
+
+        return changes
+
+    def search(
+        self, dep: Dependency, mapping: VersionMapping
+    ) -> Tuple[Version, Version]:
+        """
+        Binary search, from `goodmapping[dep]` to `target[dep]`, of the
+        first version of `dep` failing in `mapping`.
+        """
+
+        lo = bisect.bisect_left(dep.spversions, self.goodmapping[dep])
+        hi = bisect.bisect_left(dep.spversions, self.target[dep])
+        step = 1 if lo <= hi else -1
+        path = list(range(lo, hi + step, step))
+
+        # path[good] passes, path[bad] fails
+        good, bad = 0, len(path) - 1
+        while bad - good > 1:
+            mid = (good + bad) // 2
+            mapping[dep] = dep.spversions[path[mid]]
+
+            if self.passes(mapping):
+                good = mid
+            else:
+                bad = mid
+
+        return dep.spversions[path[good]], dep.spversions[path[bad]]
+
+
+class Surrogate(Algorithm):
+    """
+    Surrogate assisted search for expensive runners: a gaussian kernel over
+    the evaluated mappings estimates how likely a candidate is to pass, and
+    each step evaluates the candidate with the highest expected improvement
+    among `pool` mutations and random mappings. No mapping is evaluated twice.
+    """
+
+    desc_name = "Surrogate"
+
+    def __init__(
+        self,
+        deps: Sequence[Dependency],
+        runner: TestRunner,
+        cost_func: CostFunction,
+        optimizer: opts.Optimizer,
+        **kwargs,
+    ) -> None:
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
+        self.inimapping: VersionMapping = kwargs["inimapping"]
+        self.iterations = kwargs.get("iterations", 100)
+        self.pool = kwargs.get("pool", 64)
+        self.initial = kwargs.get("initial", 4)
+        self.bandwidth = kwargs.get("bandwidth", 0.1)
+        self.window = kwargs.get("window", 256)
+
+        # evaluated rank vectors, the same in [0, 1], and whether each passed
+        self.xs: List[Tuple[int, ...]] = []
+        self.points: List[Tuple[float, ...]] = []
+        self.ys: List[bool] = []
+        self.seen: Set[Tuple[int, ...]] = set()
+        self.norms = [max(len(dep.spversions) - 1, 1) for dep in deps]
+
+    def run(self):
+        self.evaluate(self.to_vec(self.inimapping))
+
+        while len(self.xs) < self.iterations:
+            # the model knows nothing worth exploiting until something passes
+            if len(self.xs) < self.initial or self.optimizer.opt is None:
+                vec = self.unseen_vec(self.seen.__contains__)
+
+                if vec is None:
+                    break
+
+                self.evaluate(vec)
+                continue
+
+            cands = self.candidates()
+
+            if not cands:
+                break
+
+            self.evaluate(max(cands, key=lambda cand: cand[0])[1])
+
+        return self.optimizer.optimum
+
+    def evaluate(self, vec: Tuple[int, ...]):
+        mapping = self.to_mapping(vec)
+        passed = all(self.runner.run_all(mapping))
+
+        self.xs.append(vec)
+        self.points.append(self.normalize(vec))
+        self.ys.append(passed)
+        self.seen.add(vec)
+
+        if passed:
+            self.optimizer.relax(self.cost_func(mapping), mapping)
+
+    def candidates(self) -> List[Tuple[float, Tuple[int, ...]]]:
+        """Not yet evaluated candidates, with their expected improvement."""
+
+        best = self.optimizer.mapping
+        passing = [x for x, y in zip(self.xs, self.ys) if y]
+
+        vecs = set()
+        for _ in range(self.pool * 2):
+            if len(vecs) >= self.pool:
+                break
+
+            r = self.rng.random()
+            if best is not None and r < 0.5:
+                vec = self.mutate(self.to_vec(best))
+            elif passing and r < 0.75:
+                vec = self.mutate(self.rng.choice(passing))
+            else:
+                vec = self.random_vec()
+
+            if vec not in self.seen:
+                vecs.add(vec)
+
+        ref = self._sense * self.optimizer.opt
+
+        res = []
+        for vec in vecs:
+            gain = self._sense * self.cost_func(self.to_mapping(vec)) - ref
+            prob = self.pass_probability(vec)
+
+            # ties, e.g. when nothing improves, go to the likeliest to pass
+            res.append((prob * max(gain, 0) + 1e-9 * prob, vec))
+
+        return res
+
+    def pass_probability(self, vec: Tuple[int, ...]) -> float:
+        point = self.normalize(vec)
+        scale = 2 * self.bandwidth**2 * len(self.deps)
+
+        dists = map(dist, repeat(point), self.points[-self.window :])
+        ws = [exp(-d * d / scale) for d in dists]
+
+        return (0.5 + sum(compress(ws, self.ys[-self.window :]))) / (1.0 + sum(ws))
+
+    def mutate(self, vec: Sequence[int]) -> Tuple[int, ...]:
+        res = list(vec)
+
+        for _ in range(self.rng.randint(1, min(3, len(res)))):
+            i = self.rng.randrange(len(res))
+            up = len(self.deps[i].spversions) - 1
+
+            if self.rng.random() < 0.7:
+                step = max(1, round(self.rng.expovariate(1) * up / 8))
+                res[i] += self.rng.choice((-step, step))
+                res[i] = min(max(res[i], 0), up)
+            else:
+                res[i] = self.rng.randint(0, up)
+
+        return tuple(res)
+
+    def normalize(self, vec: Sequence[int]) -> Tuple[float, ...]:
+        return tuple(i / n for i, n in zip(vec, self.norms))
+
+
+class Genetic(Algorithm):
+    """
+    Genetic algorithm over rank vectors, each generation evaluated as one
+    batch with `TestRunner.run_batch`.
+    """
+
+    desc_name = "Genetic"
+
+    def __init__(
+        self,
+        deps: Sequence[Dependency],
+        runner: TestRunner,
+        cost_func: CostFunction,
+        optimizer: opts.Optimizer,
+        **kwargs,
+    ) -> None:
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
+        self.inimapping: VersionMapping = kwargs["inimapping"]
+        self.iterations = kwargs.get("iterations", 1000)
+        self.population = kwargs.get("population", 20)
+        self.elitism = kwargs.get("elitism", 2)
+        self.tournament = kwargs.get("tournament", 3)
+        self.crossover = kwargs.get("crossover", 0.9)
+        self.mutation = kwargs.get("mutation", 1 / max(len(deps), 1))
+
+        # rank vector -> fitness, so repeated individuals aren't evaluated again
+        self.fitness: Dict[Tuple[int, ...], Tuple[bool, float, float]] = {}
+
+    def run(self):
+        pop = [self.to_vec(self.inimapping)]
+        while len(pop) < self.population:
+            pop.append(self.random_vec())
+
+        self.evaluate(pop)
+        generation = 0
+
+        while len(self.fitness) < self.iterations:
+            generation += 1
+            pop.sort(key=self.fitness.__getitem__, reverse=True)
+
+            nextpop = pop[: self.elitism]
+            attempts = 0
+            while len(nextpop) < self.population and attempts < 10 * self.population:
+                attempts += 1
+                child = self.mutate(self.crossed(self.select(pop), self.select(pop)))
+
+                # a repeated individual costs nothing, but adds no diversity
+                if child not in nextpop:
+                    nextpop.append(child)
+
+            if not self.evaluate(nextpop):
+                logger.info("Genetic converged on generation %d", generation)
+                break
+
+            pop = [vec for vec in nextpop if vec in self.fitness]
+
+        return self.optimizer.optimum
+
+    def evaluate(self, pop: Sequence[Tuple[int, ...]]) -> int:
+        """Evaluates, in one batch, the new individuals that fit the budget."""
+
+        budget = self.iterations - len(self.fitness)
+        new = list(dict.fromkeys(vec for vec in pop if vec not in self.fitness))
+        new = new[: max(budget, 0)]
+
+        mappings = [self.to_mapping(vec) for vec in new]
+        for vec, mapping, res in zip(new, mappings, self.runner.run_batch(mappings)):
+            passed = all(res)
+            cost = self.cost_func(mapping)
+
+            if passed:
+                self.optimizer.relax(cost, mapping)
+
+            self.fitness[vec] = (
+                passed,
+                sum(res) / max(len(res), 1),
+                self._sense * cost,
+            )
+
+        return len(new)
+
+    def select(self, pop: Sequence[Tuple[int, ...]]) -> Tuple[int, ...]:
+        """Tournament selection."""
+
+        contenders = self.rng.sample(pop, min(self.tournament, len(pop)))
+        return max(contenders, key=self.fitness.__getitem__)
+
+    def crossed(self, a: Sequence[int], b: Sequence[int]) -> List[int]:
+        """Uniform crossover."""
+
+        if self.rng.random() >= self.crossover:
+            return list(a)
+
+        return [x if self.rng.random() < 0.5 else y for x, y in zip(a, b)]
+
+    def mutate(self, vec: List[int]) -> Tuple[int, ...]:
+        for i, dep in enumerate(self.deps):
+            if self.rng.random() >= self.mutation:
+                continue
+
+            up = len(dep.spversions) - 1
+            step = max(1, round(self.rng.expovariate(1) * up / 8))
+            vec[i] = min(max(vec[i] + self.rng.choice((-step, step)), 0), up)
+
+        return tuple(vec)
+
+
+class Tabu(Algorithm):
+    """
+    Tabu search over the neighbourhood of `SimAnn`, evaluating the neighbours
+    of each step as one batch; moves undoing one of the last `tenure` are
+    tabu, and `patience` steps with no passing neighbour restart it.
+    """
+
+    desc_name = "Tabu"
+
+    def __init__(
+        self,
+        deps: Sequence[Dependency],
+        runner: TestRunner,
+        cost_func: CostFunction,
+        optimizer: opts.Optimizer,
+        **kwargs,
+    ) -> None:
+        super().__init__(deps, runner, cost_func, optimizer, **kwargs)
+        self.inimapping: VersionMapping = kwargs["inimapping"]
+        self.iterations = kwargs.get("iterations", 1000)
+        self.tenure = kwargs.get("tenure", max(7, len(deps) // 2))
+        self.patience = kwargs.get("patience", 2)
+
+        self.evaluations = 0
+        self.visited: Set[int] = set()
+        # recent moves as (dependency index, direction)
+        self.tabu: Deque[Tuple[int, int]] = deque(maxlen=self.tenure)
+
+    def run(self):
+        cur = self.to_vec(self.inimapping)
+        self.evaluate([cur])
+        stale = 0
+
+        while self.evaluations < self.iterations:
+            moves = []
+            for i, dep in enumerate(self.deps):
+                for d in (-1, 1):
+                    if 0 <= cur[i] + d < len(dep.spversions):
+                        vec = cur[:i] + (cur[i] + d,) + cur[i + 1 :]
+
+                        if hash(vec) not in self.visited:
+                            moves.append(((i, d), vec, self.gain(vec)))
+
+            moves = [
+                move
+                for move in moves
+                if (move[0][0], -move[0][1]) not in self.tabu
+                or self.optimizer.opt is None
+                or move[2] > self._sense * self.optimizer.opt
+            ]
+
+            if not moves or stale >= self.patience:
+                logger.debug("Restarting")
+                vec = self.unseen_vec(lambda vec: hash(vec) in self.visited)
+
+                if vec is None:
+                    break
+
+                cur = vec
+                self.tabu.clear()
+                self.evaluate([cur])
+                stale = 0
+                continue
+
+            # the most promising ones first, in case the budget runs out
+            moves.sort(key=lambda move: move[2], reverse=True)
+            res = self.evaluate([vec for _, vec, _ in moves])
+
+            (move, cur, _), passed = max(
+                zip(moves, res), key=lambda pair: (pair[1], pair[0][2])
+            )
+            self.tabu.append(move)
+            stale = 0 if passed == 1 else stale + 1
+
+        return self.optimizer.optimum
+
+    def evaluate(self, vecs: Sequence[Tuple[int, ...]]) -> List[float]:
+        """
+        Evaluates, in one batch, as many of `vecs` as the budget allows; the
+        fraction of tests each one passed, 0 for those left out.
+        """
+
+        vecs = vecs[: max(self.iterations - self.evaluations, 0)]
+        mappings = [self.to_mapping(vec) for vec in vecs]
+        self.evaluations += len(vecs)
+
+        fractions = []
+        for vec, mapping, res in zip(vecs, mappings, self.runner.run_batch(mappings)):
+            self.visited.add(hash(vec))
+
+            if all(res):
+                self.optimizer.relax(self.cost_func(mapping), mapping)
+
+            fractions.append(sum(res) / max(len(res), 1))
+
+        return fractions
+
+    def gain(self, vec: Sequence[int]) -> float:
+        return self._sense * self.cost_func(self.to_mapping(vec))
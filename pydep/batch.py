@@ -0,0 +1,228 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Dict, Iterator, Optional, TextIO, Tuple, Union
+
+from pydep import costs
+from pydep import opts
+import pydep.algorithms as algos
+from pydep.parser import CASE_SUFFIX, ParsedConfig, load_virtual_config
+from pydep.parser import parse_virtual_config
+from pydep.rng import derive_seed
+from pydep.tests import LinearRunner
+from pydep.versions import VersionMapping
+
+# a testcase is given by the path of a TOML file, by an already loaded config
+# or by a JSON line that isn't a testcase, for its error to be reported
+Case = Tuple[str, Union[Path, dict, str]]
+
+
+def objectives(
+    inimapping: VersionMapping, pareto: bool = False
+) -> Tuple[costs.CostFunction, opts.Optimizer]:
+    """
+    The cost function and optimizer of a search: the newest versions or,
+    with `pareto`, the front of the newest versions against the fewest
+    changes from `inimapping`.
+    """
+
+    newest = costs.Sum(costs.version_to_float)
+
+    if pareto:
+        return costs.Multi(newest, costs.Changes(inimapping)), opts.Pareto((1, -1))  # type: ignore
+
+    return newest, opts.Max()
+
+
+def virtual_solver(
+    config: Union[dict, ParsedConfig],
+    algorithm: str,
+    iterations: int,
+    seed: int = 0,
+    pareto: bool = False,
+) -> algos.Algorithm:
+    """A solver of the virtual config `config`, either a dict or already parsed."""
+
+    if isinstance(config, dict):
+        config = parse_virtual_config(config)
+
+    deps, tests, inivers = config
+
+    mapping = {}
+    for dep, ver in zip(deps, inivers):
+        mapping[dep] = ver
+
+    algo = getattr(algos, algorithm)
+
+    if pareto and not algo.pareto:
+        raise ValueError(f"{algorithm} doesn't support Pareto optimization")
+
+    cost_func, optimizer = objectives(mapping, pareto)
+
+    return algo(
+        deps,
+        LinearRunner(tests),
+        cost_func,
+        optimizer,
+        inimapping=mapping,
+        iterations=iterations,
+        seed=seed,
+    )
+
+
+def solve_virtual(
+    config: Union[dict, ParsedConfig], algorithm: str, iterations: int, seed: int = 0
+) -> opts.AlgorithmOutput:
+    return virtual_solver(config, algorithm, iterations, seed).run()
+
+
+def iter_cases(source: Path, stdin: TextIO = sys.stdin) -> Iterator[Case]:
+    """
+    Yields the testcases of `source`, which is either a directory of TOML
+    and `*.case.jsonl` testcases, one of those, a JSON lines file with a
+    testcase per line or `-` to read JSON lines from `stdin`. A JSON testcase
+    may carry a `name`, otherwise it is named after its line number. Lines
+    that aren't a JSON object are yielded as they are.
+    """
+
+    if source.is_dir():
+        paths = [*source.glob("*.toml"), *source.glob(f"*{CASE_SUFFIX}")]
+
+        for path in sorted(paths):
+            yield path.name, path
+
+        return
+
+    if source.suffix == ".toml" or source.name.endswith(CASE_SUFFIX):
+        yield source.name, source
+        return
+
+    fd = stdin if str(source) == "-" else source.open()
+
+    try:
+        for lineno, line in enumerate(fd, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                d = json.loads(line)
+            except json.JSONDecodeError:
+                d = None
+
+            if not isinstance(d, dict):
+                yield str(lineno), line
+                continue
+
+            yield str(d.pop("name", lineno)), d
+
+    finally:
+        if fd is not stdin:
+            fd.close()
+
+
+def solve_case(case: Case, algorithm: str, iterations: int, seed: int = 0) -> dict:
+    """
+    Solves a testcase, it never raises so a failing case doesn't stop a batch.
+    The solver's seed derives from `seed` and the case's name, so it doesn't
+    depend on which worker solves it.
+    """
+
+    name, what = case
+    res = _result(name, "solved")
+    start = time.perf_counter()
+
+    try:
+        if isinstance(what, str):
+            what = json.loads(what)
+
+            if not isinstance(what, dict):
+                raise ValueError(f"A testcase is a JSON object, not {what!r}")
+
+        if isinstance(what, Path):
+            what = load_virtual_config(what)  # type: ignore
+
+        cost, mapping = solve_virtual(
+            what, algorithm, iterations, derive_seed(seed, name)
+        )
+        res["cost"] = cost
+        res["mapping"] = {dep.name: str(ver) for dep, ver in mapping.items()}
+
+    except opts.NotSolutionException:
+        res["status"] = "unsolved"
+
+    except Exception as err:
+        res = _result(name, "error", err)
+
+    res["time"] = time.perf_counter() - start
+    return res
+
+
+def _result(name: str, status: str, err: Optional[Exception] = None) -> dict:
+    res = {"name": name, "status": status, "cost": None, "mapping": None}
+
+    if err is not None:
+        res["error"] = f"{err.__class__.__name__}: {err}"
+
+    return res
+
+
+def run_batch(
+    cases: Iterator[Case],
+    algorithm: str,
+    iterations: int,
+    out: TextIO = sys.stdout,
+    workers: Optional[int] = None,
+    window: int = 4,
+    seed: int = 0,
+) -> int:
+    """
+    Solves `cases` in a pool of `workers` processes and writes a JSON line per
+    case to `out` as soon as it finishes, so the order is the completion order.
+    At most `window` cases per worker are in flight, so cases are read lazily.
+    Returns the number of cases that finished with an error, a worker dying
+    included.
+    """
+
+    errors = 0
+    workers = workers or os.cpu_count() or 1
+    limit = window * workers
+
+    def write(res: dict):
+        nonlocal errors
+
+        errors += res["status"] == "error"
+        out.write(json.dumps(res) + "\n")
+        out.flush()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # future -> name of its case
+        pending: Dict[Future, str] = {}
+
+        def drain(block_until: int):
+            while len(pending) > block_until:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for fut in done:
+                    name = pending.pop(fut)
+
+                    try:
+                        write(fut.result())
+                    except Exception as err:  # e.g. BrokenProcessPool
+                        write(_result(name, "error", err))
+
+        for case in cases:
+            try:
+                fut = executor.submit(solve_case, case, algorithm, iterations, seed)
+            except Exception as err:  # the pool broke meanwhile
+                write(_result(case[0], "error", err))
+                continue
+
+            pending[fut] = case[0]
+            drain(limit - 1)
+
+        drain(0)
+
+    return errors
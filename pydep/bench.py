@@ -0,0 +1,222 @@
+"""
+Benchmark harness for the algorithms over suites of virtual testcases.
+
+Testcases are parsed once and shipped to a pool of worker processes, then
+every (algorithm, budget, case, seed) job runs in a worker and produces a
+`JobResult`. Results can be aggregated per (algorithm, budget) and written
+as CSV or JSON.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from dataclasses import asdict, dataclass, fields
+import json
+import os
+from pathlib import Path
+import time
+import tracemalloc
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pydep import costs
+from pydep import opts
+import pydep.algorithms as algos
+from pydep.deps import Dependency
+from pydep.parser import load_virtual_config, parse_virtual_config
+from pydep.rng import substream
+from pydep.tests import CountingRunner, LinearRunner, VirtualTest
+from pydep.versions import VersionMapping
+
+ParsedCase = Tuple[List[Dependency], List[VirtualTest], VersionMapping]
+
+# parsed testcases of the current worker, set by `_init_worker`
+_cases: Sequence[ParsedCase] = ()
+
+
+@dataclass
+class Job:
+    algorithm: str
+    budget: int
+    case: int
+    seed: int
+    trace_memory: bool = False
+
+
+@dataclass
+class JobResult:
+    algorithm: str
+    budget: int
+    case: int
+    seed: int
+    success: bool
+    cost: Optional[float]
+    evaluations: int
+    time: float
+    # peak of memory allocated while solving, only when tracing memory
+    peak_memory: Optional[int] = None
+
+
+def parse_case(case: Union[dict, Path]) -> ParsedCase:
+    """Parses a testcase given as a dict or by the path of its file."""
+
+    if isinstance(case, Path):
+        deps, tests, inivers = load_virtual_config(case)
+    else:
+        deps, tests, inivers = parse_virtual_config(case)
+
+    return deps, tests, dict(zip(deps, inivers))
+
+
+def _init_worker(cases: Sequence[ParsedCase]):
+    global _cases
+    _cases = cases
+
+
+def run_job(job: Job) -> JobResult:
+    deps, tests, inimapping = _cases[job.case]
+    runner = CountingRunner(LinearRunner(tests))
+
+    solver = getattr(algos, job.algorithm)(
+        deps,
+        runner,
+        costs.Sum(costs.version_to_float),
+        opts.Max(),
+        inimapping=inimapping,
+        iterations=job.budget,
+        # every job gets its own stream, no matter which worker runs it
+        rng=substream(job.seed, job.algorithm, job.budget, job.case),
+    )
+
+    cost = None
+    peak = None
+
+    if job.trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+
+    try:
+        cost, _ = solver.run()
+    except opts.NotSolutionException:
+        pass
+
+    elapsed = time.perf_counter() - start
+
+    if job.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return JobResult(
+        job.algorithm,
+        job.budget,
+        job.case,
+        job.seed,
+        success=cost is not None,
+        cost=cost,
+        evaluations=runner.evaluations,
+        time=elapsed,
+        peak_memory=peak,
+    )
+
+
+def make_jobs(
+    algorithms: Iterable[str],
+    budgets: Iterable[int],
+    cases: int,
+    seeds: int,
+    trace_memory: bool = False,
+) -> List[Job]:
+    return [
+        Job(algo, budget, case, seed, trace_memory)
+        for algo in algorithms
+        for budget in budgets
+        for case in range(cases)
+        for seed in range(seeds)
+    ]
+
+
+def run_benchmark(
+    cases: Sequence[Union[dict, Path]],
+    algorithms: Iterable[str],
+    budgets: Iterable[int],
+    seeds: int = 1,
+    workers: Optional[int] = None,
+    trace_memory: bool = False,
+) -> Iterator[JobResult]:
+    """
+    Runs every (algorithm, budget, case, seed) job over `cases` in a pool of
+    `workers` processes, yielding the results in job order. With
+    `trace_memory` the peak memory of each job is measured with tracemalloc,
+    which slows jobs down noticeably.
+    """
+
+    parsed = [parse_case(d) for d in cases]
+    jobs = make_jobs(algorithms, budgets, len(parsed), seeds, trace_memory)
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 8))
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(parsed,)
+    ) as executor:
+        yield from executor.map(run_job, jobs, chunksize=chunksize)
+
+
+def summarize(results: Iterable[JobResult]) -> Dict[str, Dict[int, dict]]:
+    """
+    Aggregates results per algorithm and budget, with the number of jobs,
+    successes, the sum of the costs found, evaluations and time.
+    """
+
+    summary: Dict[str, Dict[int, dict]] = {}
+
+    for res in results:
+        d = summary.setdefault(res.algorithm, {}).setdefault(
+            res.budget,
+            {
+                "succ_sum": 0,
+                "successes": 0,
+                "total": 0,
+                "evaluations": 0,
+                "time": 0,
+                "peak_memory": None,
+            },
+        )
+
+        d["total"] += 1
+        d["evaluations"] += res.evaluations
+        d["time"] += res.time
+
+        if res.peak_memory is not None:
+            d["peak_memory"] = max(d["peak_memory"] or 0, res.peak_memory)
+
+        if res.success:
+            d["successes"] += 1
+            d["succ_sum"] += res.cost
+
+    for per_budget in summary.values():
+        for d in per_budget.values():
+            d["success_rate"] = d["successes"] / d["total"]
+            d["evals_per_sec"] = d["evaluations"] / d["time"] if d["time"] else 0
+
+    return summary
+
+
+def write_csv(results: Iterable[JobResult], path: Path):
+    with path.open("w", newline="") as fd:
+        writer = csv.DictWriter(fd, [f.name for f in fields(JobResult)])
+        writer.writeheader()
+
+        for res in results:
+            writer.writerow(asdict(res))
+
+
+def write_json(results: Sequence[JobResult], path: Path):
+    with path.open("w") as fd:
+        json.dump(
+            {
+                "results": [asdict(res) for res in results],
+                "summary": summarize(results),
+            },
+            fd,
+            indent=2,
+        )
@@ -1,4 +1,4 @@
-from typing import Callable
+from typing import Callable, Tuple
 from math import log
 from packaging.version import Version
 from pydep.versions import VersionMapping
@@ -27,3 +27,23 @@ class CostFunction:
 class Sum(CostFunction):
     def __call__(self, mapping: VersionMapping) -> float:
         return sum(self.version_to_float(v) for v in mapping.values())
+
+
+class Changes(CostFunction):
+    """Number of dependencies pinned to other version than in `inimapping`."""
+
+    def __init__(self, inimapping: VersionMapping) -> None:
+        self.inimapping = inimapping
+
+    def __call__(self, mapping: VersionMapping) -> float:
+        return sum(self.inimapping.get(dep) != ver for dep, ver in mapping.items())
+
+
+class Multi:
+    """The costs of several objectives, as a tuple, for `opts.Pareto`."""
+
+    def __init__(self, *funcs: CostFunction) -> None:
+        self.funcs = funcs
+
+    def __call__(self, mapping: VersionMapping) -> Tuple[float, ...]:
+        return tuple(func(mapping) for func in self.funcs)
@@ -1,26 +1,91 @@
 from __future__ import annotations
-from typing import Sequence
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
 
 from packaging.requirements import Requirement
+from packaging.specifiers import SpecifierSet
 from packaging.version import Version
 
 
+@lru_cache(maxsize=None)
+def _specifier_set(specifier: str) -> SpecifierSet:
+    return SpecifierSet(specifier)
+
+
+@lru_cache(maxsize=1 << 16)
+def _conforms(specifier: str, version: Version) -> bool:
+    """
+    Whether `version` conforms to `specifier`, shared between all the
+    dependencies declaring the same specifier.
+    """
+
+    return version in _specifier_set(specifier)
+
+
 class Dependency:
+    """
+    A dependency and its candidate versions.
+
+    Sorting the versions and matching them against the specifier is deferred
+    until `versions` or `spversions` is first accessed, so building many
+    dependencies that are never searched is cheap.
+    """
+
+    __slots__ = (
+        "name",
+        "org_req",
+        "_rawversions",
+        "_versions",
+        "_spversions",
+        "_ranks",
+    )
+
     def __init__(
         self, name: str, versions: Sequence[Version], org_req: Requirement
     ) -> None:
         self.name = name
-        self.versions = sorted(versions)
         self.org_req = org_req
+        self._rawversions = versions
+        self._versions: Optional[List[Version]] = None
+        self._spversions: Optional[List[Version]] = None
+        self._ranks: Optional[Dict[int, int]] = None
+
+    @property
+    def versions(self) -> List[Version]:
+        if self._versions is None:
+            self._versions = sorted(self._rawversions)
+            self._rawversions = ()
+
+        return self._versions
+
+    @property
+    def spversions(self) -> List[Version]:
+        """Versions that conform to the specifier of the original requirement."""
+
+        if self._spversions is None:
+            specifier = str(self.org_req.specifier)
+            self._spversions = [
+                ver for ver in self.versions if _conforms(specifier, ver)
+            ]
+
+        return self._spversions
+
+    @property
+    def ranks(self) -> Dict[int, int]:
+        """
+        The `id` of each object in `versions`, as the versions of mappings
+        are, to its index there. Looking up a version by identity is hashing
+        an int rather than comparing versions.
+        """
+
+        if self._ranks is None:
+            self._ranks = {id(ver): i for i, ver in enumerate(self.versions)}
 
-        # versions that conform to specifier
-        self.spversions = [
-            ver for ver in self.versions if ver in self.org_req.specifier
-        ]
+        return self._ranks
 
     def __eq__(self, other: object) -> bool:
         if self.__class__ is other.__class__:
-            return self.name == other.name
+            return self.name == other.name  # type: ignore
         return NotImplemented
 
     def __hash__(self) -> int:
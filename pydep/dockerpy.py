@@ -0,0 +1,525 @@
+import io
+import logging
+from pathlib import Path
+import re
+import tarfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import docker
+import docker.errors
+import docker.utils.build
+from packaging.requirements import Requirement
+from packaging.version import Version
+from pep517 import meta
+
+from pydep.deps import Dependency
+from pydep.depsmgr import DepsManager
+from pydep.hosts import HOST_ERRORS, DockerHost, HostFailure, HostPool
+from pydep.hosts import NoHostAvailable
+from pydep.metrics import metrics
+from pydep.scheduler import Limits, Scheduler
+from pydep.tests import ExternalRunner, TestCmd
+from pydep.vercache import VersionsCache
+from pydep.versions import VersionMapping, parse_freeze
+
+logger = logging.getLogger(__name__)
+
+# never worth sending to the docker daemon, on top of the .dockerignore
+DEFAULT_EXCLUDES = [
+    ".git",
+    ".hg",
+    ".svn",
+    ".venv",
+    "venv",
+    ".tox",
+    ".nox",
+    ".mypy_cache",
+    ".pytest_cache",
+    "**/__pycache__",
+    "**/*.py[cod]",
+]
+
+
+def _tar_member(name: str, content: str) -> bytes:
+    data = content.encode()
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+
+    return info.tobuf() + data + b"\0" * (-len(data) % tarfile.BLOCKSIZE)
+
+
+class BuildContext:
+    """
+    The project as a docker build context, archived once and reused for every
+    build, each one adding its own dockerfile. Files matching the project's
+    .dockerignore, `DEFAULT_EXCLUDES` or `excludes` are left out.
+    """
+
+    dockerfile = ".pydep.Dockerfile"
+
+    def __init__(self, project: Path, excludes: Sequence[str] = ()) -> None:
+        self.project = project
+        self.excludes = DEFAULT_EXCLUDES + list(excludes)
+
+        dockerignore = project / ".dockerignore"
+        if dockerignore.exists():
+            for line in dockerignore.read_text().splitlines():
+                line = line.strip()
+
+                if line and not line.startswith("#"):
+                    self.excludes.append(line)
+
+        self._members: Optional[bytes] = None
+
+    @property
+    def members(self) -> bytes:
+        """The archived project without the end of archive marker."""
+
+        if self._members is None:
+            with metrics.timer("docker.context"):
+                archive = docker.utils.build.tar(
+                    str(self.project),
+                    exclude=list(self.excludes),
+                    dockerfile=(self.dockerfile, None),
+                )
+
+                with tarfile.open(fileobj=archive) as tf:
+                    tf.getmembers()
+                    end = tf.offset
+
+                archive.seek(0)
+                self._members = archive.read(end)
+                archive.close()
+
+            logger.info("Build context has %d bytes", len(self._members))
+
+        return self._members
+
+    def files(self) -> List[str]:
+        """The files of the context, relative to the project."""
+
+        paths = docker.utils.build.exclude_paths(
+            str(self.project), list(self.excludes), dockerfile=self.dockerfile
+        )
+        return sorted(path for path in paths if (self.project / path).is_file())
+
+    def with_dockerfile(self, dockerfile: str, project: bool = True) -> io.BytesIO:
+        """
+        The context to build `dockerfile`, without the project unless
+        `project`, for dockerfiles not copying it.
+        """
+
+        members = b""
+
+        if project:
+            # members are extracted in order, so this .dockerignore replaces
+            # the project's one; listing the dockerfile keeps it out of COPY,
+            # so it doesn't invalidate the cache of the layer copying the
+            # project
+            dockerignore = "\n".join(self.excludes + [self.dockerfile, ".dockerignore"])
+            members = self.members + _tar_member(".dockerignore", dockerignore)
+
+        return io.BytesIO(
+            members
+            + _tar_member(self.dockerfile, dockerfile)
+            + b"\0" * (2 * tarfile.BLOCKSIZE)
+        )
+
+
+def freeze_mapping(
+    project: Path,
+    freeze: str,
+    pyver: str,
+    top_level: bool = True,
+    cache_min_year: int = 2018,
+) -> VersionMapping:
+    """
+    Maps the dependencies in the `pip freeze` output `freeze` to their
+    installed versions, with `top_level` only those required by `project`.
+    """
+
+    pins = parse_freeze(freeze)
+    deps = list(pins)
+    vers = list(pins.values())
+
+    versions_cache = VersionsCache(Version(pyver), loyear=cache_min_year)
+    versions = versions_cache.fetch_versions(deps)
+    mapping = {}
+
+    dist = meta.load(project)
+
+    reqs = {}
+    for line in dist.requires or []:
+        req = Requirement(line)
+        req.name = req.name.lower().replace("-", "_")
+        reqs[req.name] = req
+
+    for name, ver in zip(deps, vers):
+        req = Requirement(f"{name}=={ver}")
+
+        if top_level:
+            norm_name = name.lower().replace("-", "_")
+
+            if norm_name not in reqs:
+                continue
+
+            req = reqs[norm_name]
+
+        mapping[Dependency(name, versions[name], req)] = Version(ver)
+
+    return mapping
+
+
+class DockerPyRunner(ExternalRunner):
+    """
+    Builds an image per candidate and runs the tests in containers of it, on
+    the docker daemons `hosts`, by default the one of the environment. What
+    builds and containers take from each host is bounded by `limits`.
+
+    The initial image, with the user, the virtual environment, the project
+    and its initial dependencies, is built once on each host and is the
+    parent, by id, of every candidate image there, so a candidate only
+    builds the layer installing its pins, from a context without the project.
+    """
+
+    def __init__(
+        self,
+        project: Path,
+        depsmgr: DepsManager,
+        tests: Sequence[TestCmd],
+        img_basename: str,
+        pytag: str,
+        excludes: Sequence[str] = (),
+        workers: int = 1,
+        hosts: Sequence[DockerHost] = (),
+        limits: Optional[Limits] = None,
+    ) -> None:
+        super().__init__(project, depsmgr, tests)
+        self.workers = workers
+        self.hosts = HostPool(hosts or [DockerHost()])
+
+        self.img = f"python:{pytag}"
+        self.img_basename = img_basename
+        self.init_tag = f"pydep/{img_basename}"
+        self.scheduler = Scheduler(limits or Limits(), self.init_tag)
+        self.workdir = "/home/pydep/app"
+        self.context = BuildContext(project, excludes)
+
+        # full id of the initial image on each host, and a lock per host
+        # building it
+        self.init_imgs: Dict[DockerHost, str] = {}
+        self._init_locks: Dict[DockerHost, threading.Lock] = {}
+        self._init_lock = threading.Lock()
+
+    @property
+    def client(self) -> docker.DockerClient:
+        """The client of the first host, the one with the initial image."""
+
+        return self.hosts.hosts[0].client
+
+    def _base_dockerfile(self) -> List[str]:
+        return [
+            f"FROM {self.img}",
+            "RUN groupadd pydep && useradd -mg pydep pydep",
+            "USER pydep",
+            "ENV VIRTUAL_ENV=/home/pydep/.venv",
+            "RUN python -m venv $VIRTUAL_ENV",
+            "ENV PATH=$VIRTUAL_ENV/bin:$PATH",
+            "RUN pip config set global.disable-pip-version-check true",
+            f"COPY --chown=pydep:pydep . {self.workdir}/",
+            f"WORKDIR {self.workdir}",
+            f"ENV PYTHONPATH={self.workdir}",
+        ]
+
+    def _build(
+        self,
+        dockerfile: str,
+        tag: str,
+        client: Optional[docker.DockerClient] = None,
+        project: bool = True,
+    ) -> str:
+        """
+        Builds `dockerfile`, with the project as context if `project`, on
+        `client` or else the first host, and returns the id of the image.
+        Unlike `images.build` this follows the build as it goes, to time the
+        `RUN` steps installing dependencies on their own.
+        """
+
+        logs = []
+        image_id = None
+        step, step_start = "", time.perf_counter()
+
+        def end_step():
+            if "pip install" in step:
+                metrics.observe("docker.install", time.perf_counter() - step_start)
+
+        client = client or self.client
+
+        with metrics.timer("docker.build"):
+            for chunk in client.api.build(
+                fileobj=self.context.with_dockerfile(dockerfile, project),
+                custom_context=True,
+                dockerfile=BuildContext.dockerfile,
+                rm=True,
+                tag=tag,
+                decode=True,
+                container_limits=self.scheduler.limits.build_limits(),
+            ):
+                logs.append(chunk)
+
+                if "error" in chunk:
+                    raise docker.errors.BuildError(chunk["error"], logs)
+
+                line = chunk.get("stream", "")
+
+                if line.startswith("Step "):
+                    end_step()
+                    step, step_start = line, time.perf_counter()
+
+                match = re.search(r"(^Successfully built |sha256:)([0-9a-f]+)$", line)
+                if match:
+                    image_id = match.group(2)
+
+            end_step()
+
+        if image_id is None:
+            raise docker.errors.BuildError(logs[-1] if logs else "Unknown", logs)
+
+        return image_id
+
+    def init_image(self, host: Optional[DockerHost] = None) -> str:
+        """
+        The id of the image with the project and its initial dependencies
+        installed on `host`, by default the first one, built the first time
+        it's needed.
+        """
+
+        host = host or self.hosts.hosts[0]
+
+        with self._init_lock:
+            lock = self._init_locks.setdefault(host, threading.Lock())
+
+        with lock:
+            if host not in self.init_imgs:
+                logger.info("Building the initial image on %s", host)
+
+                dockerfile = self._base_dockerfile()
+                dockerfile.append("RUN " + self.depsmgr.cmd_init_pinned_deps())
+                dockerfile.append("CMD pip freeze")
+                dfstr = "\n".join(dockerfile)
+                logger.debug(dfstr)
+
+                with metrics.timer("docker.init_build"):
+                    image_id = self._build(dfstr, self.init_tag, host.client)
+
+                # the tag may be moved by other builds, the id stays
+                self.init_imgs[host] = host.client.api.inspect_image(image_id)["Id"]
+
+        return self.init_imgs[host]
+
+    def init_deps_mapping(
+        self, top_level=True, cache_min_year: int = 2018, transitive: bool = False
+    ) -> VersionMapping:
+        """
+        The installed versions of the dependencies, with `top_level` only the
+        project's own ones; with `transitive` too, the rest get pinned to
+        versions resolved for each candidate.
+        """
+
+        img = self.init_image()
+
+        # one container for both, the python version on the first line
+        with metrics.timer("docker.probe"):
+            output = self.client.containers.run(
+                img,
+                remove=True,
+                command=["/bin/sh", "-c", 'echo "$PYTHON_VERSION"; pip freeze'],
+            ).decode()  # type: ignore
+
+        pyver, _, output = output.partition("\n")
+        pyver = self.pyver = pyver.strip()
+        logger.info("Container is running on Python %s", pyver)
+
+        mapping = freeze_mapping(self.project, output, pyver, top_level, cache_min_year)
+
+        if transitive:
+            from pydep.resolver import Resolver
+
+            self.resolver = Resolver.from_freeze(mapping, output, pyver, cache_min_year)
+
+        return mapping
+
+    def probe(self, code: str) -> str:
+        img = self.init_image()
+
+        with metrics.timer("docker.probe"):
+            output = self.client.containers.run(
+                img, remove=True, command=["python", "-c", code]
+            )
+
+        return output.decode()  # type: ignore
+
+    def run_all(self, pinned_vers: VersionMapping) -> List[bool]:
+        logger.info("Running tests")
+        metrics.incr("evaluations")
+
+        with metrics.timer("docker.evaluation"):
+            res = self._run_all(pinned_vers)
+
+        if all(res):
+            metrics.incr("evaluations.passed")
+
+        return res
+
+    def _run_all(self, pinned_vers: VersionMapping) -> List[bool]:
+        install = self.install_mapping(pinned_vers)
+
+        if install is None:
+            return [False] * len(self.tests)
+
+        # what tells candidates apart, the parent differs between hosts
+        pins = "RUN " + self.depsmgr.cmd_install_deps(install)
+        logger.debug(pins)
+
+        # a host failing on its own gets the candidate retried on another one
+        tried: List[DockerHost] = []
+        for _ in range(len(self.hosts.hosts)):
+            host = self.hosts.acquire(pins, tried)
+
+            if host is None:
+                break
+
+            tried.append(host)
+            logger.debug("Evaluating on %s", host)
+
+            failed = True
+
+            try:
+                res = self._evaluate(host, pins, pinned_vers)
+                failed = False
+            except HOST_ERRORS as err:
+                logger.warning("%s failed: %s", host, err)
+                continue
+            finally:
+                self.hosts.release(host, pins, failed)
+
+            return res
+
+        raise NoHostAvailable("No host left to evaluate the candidate")
+
+    def _evaluate(
+        self, host: DockerHost, pins: str, pinned_vers: VersionMapping
+    ) -> List[bool]:
+        resources = self.scheduler.of(host)
+        # a tag per candidate, so the image can be told apart and removed
+        tag = f"pydep/{self.img_basename}-runner:{HostPool.key(pins)[:12]}"
+
+        try:
+            parent = self.init_image(host)
+        except docker.errors.BuildError as err:
+            raise HostFailure(f"The initial image didn't build: {err}") from err
+
+        dfstr = f"FROM {parent}\n{pins}"
+        resources.images.reserve(tag)
+
+        try:
+            try:
+                with resources.building():
+                    self._build(dfstr, tag, host.client, project=False)
+            except docker.errors.BuildError as err:
+                metrics.incr("docker.build_errors")
+
+                for line in err.build_log:
+                    if "stream" in line:  # temporal maybe?
+                        logger.error(line["stream"])
+
+                return [False] * len(self.tests)
+
+            resources.images.use(tag)
+            return self._run_tests(host, tag, pinned_vers)
+
+        finally:
+            resources.images.release(tag)
+
+    def _run_tests(
+        self, host: DockerHost, img: str, pinned_vers: VersionMapping
+    ) -> List[bool]:
+        resources = self.scheduler.of(host)
+
+        res = []
+        for cmd in self.test_cmds(pinned_vers):
+            if cmd is None:
+                res.append(True)
+                continue
+
+            logger.debug("Running %s", cmd)
+            success = False
+
+            try:
+                with resources.testing():
+                    success = self._run_test(host.client, img, cmd)
+            except HOST_ERRORS:
+                raise
+            except Exception as err:
+                logger.warning(err)
+
+            if not success:
+                metrics.incr("docker.test_failures")
+
+            res.append(success)
+
+        self.record(pinned_vers, res)
+        return res
+
+    def _run_test(self, client: docker.DockerClient, img: str, cmd: str) -> bool:
+        with metrics.timer("docker.start"):
+            # unbuffered, so failures show up in the logs as they happen
+            container = client.containers.create(
+                img,
+                command=cmd,
+                environment={"PYTHONUNBUFFERED": "1"},
+                **self.scheduler.limits.run_kwargs(),
+            )
+            container.start()
+
+        def kill():
+            try:
+                container.kill()
+            except docker.errors.APIError:  # it exited meanwhile
+                pass
+
+        try:
+            with metrics.timer("docker.test"):
+                with self.early_stop.deadline(kill) as expired:
+                    # output is streamed, so a failure pattern stops the
+                    # container right away instead of at the end of the run
+                    logs = container.logs(stream=True, follow=True)
+                    matched, output = self.early_stop.watch(logs)
+
+                    if matched is not None:
+                        kill()
+
+                    status = container.wait()["StatusCode"]
+
+            if self.stopped(cmd, matched, expired.is_set()):
+                return False
+
+            if status != 0:
+                logger.warning(
+                    "%s exited with status %d: %s",
+                    cmd,
+                    status,
+                    output,
+                    extra={"cmd": cmd, "status": status},
+                )
+
+        finally:
+            container.remove(force=True)
+
+        return status == 0
+
+    def close(self):
+        self.scheduler.close()
@@ -0,0 +1,207 @@
+"""
+A pool of docker daemons to spread the builds and runs of candidates over.
+
+Each `DockerHost` takes up to `capacity` candidates at a time. Candidates go
+to the free host likeliest to have their layers cached: one that already
+built the same dockerfile, then one that built anything, as they share the
+layers of the base dockerfile. A host failing `max_failures` times in a row,
+for reasons of its own rather than of the candidate, is left out for a
+while, and the candidate is retried on another one.
+"""
+
+from collections import OrderedDict
+import hashlib
+import logging
+import threading
+import time
+from typing import Collection, List, Optional, Sequence, Tuple
+
+import docker
+import docker.errors
+import requests.exceptions
+
+from pydep.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HostFailure(Exception):
+    """A host can't evaluate candidates, e.g. its initial image won't build."""
+
+
+class NoHostAvailable(Exception):
+    """
+    Every host failed or is quarantined, so a candidate has no verdict: it
+    must not be taken, nor remembered, as failing.
+    """
+
+
+# errors of the daemon or of reaching it, rather than of the candidate
+HOST_ERRORS = (
+    docker.errors.APIError,
+    requests.exceptions.ConnectionError,
+    HostFailure,
+)
+
+
+class DockerHost:
+    """
+    The docker daemon at `url`, the one of the environment if None, running
+    up to `capacity` candidates at a time.
+    """
+
+    def __init__(
+        self, url: Optional[str] = None, capacity: int = 1, remember: int = 256
+    ) -> None:
+        self.url = url
+        self.capacity = capacity
+        self.running = 0
+        self.failures = 0
+        self.quarantined_until = 0.0
+        # hashes of the last dockerfiles built here, their layers are cached
+        self.built: "OrderedDict[str, None]" = OrderedDict()
+        self.remember = remember
+        self._client: Optional[docker.DockerClient] = None
+
+    def __repr__(self) -> str:
+        return f"DockerHost({self.url or 'env'}, capacity={self.capacity})"
+
+    @classmethod
+    def parse(cls, spec: str) -> "DockerHost":
+        """The host of `spec`, `URL` or `URL#CAPACITY`; `env` is the default one."""
+
+        url, _, capacity = spec.partition("#")
+        return cls(None if url in ("", "env") else url, int(capacity or 1))
+
+    @property
+    def client(self) -> docker.DockerClient:
+        if self._client is None:
+            if self.url is None:
+                self._client = docker.from_env()
+            else:
+                self._client = docker.DockerClient(base_url=self.url)
+
+        return self._client
+
+    def remember_build(self, key: str):
+        self.built[key] = None
+        self.built.move_to_end(key)
+
+        while len(self.built) > self.remember:
+            self.built.popitem(last=False)
+
+    def score(self, key: str) -> Tuple[int, float]:
+        """How good a pick this host is for the dockerfile hashed as `key`."""
+
+        cached = 2 if key in self.built else 1 if self.built else 0
+        return cached, -self.running / self.capacity
+
+
+class HostPool:
+    """
+    Schedules candidates over `hosts`; a host failing `max_failures` times in
+    a row is quarantined for `cooldown` seconds, doubling each time it fails
+    again right after.
+    """
+
+    def __init__(
+        self,
+        hosts: Sequence[DockerHost],
+        max_failures: int = 3,
+        cooldown: float = 60.0,
+    ) -> None:
+        if not hosts:
+            raise ValueError("A pool needs at least a host")
+
+        self.hosts = list(hosts)
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.cond = threading.Condition()
+
+    @property
+    def capacity(self) -> int:
+        return sum(host.capacity for host in self.hosts)
+
+    @staticmethod
+    def key(dockerfile: str) -> str:
+        return hashlib.sha256(dockerfile.encode()).hexdigest()
+
+    def _free(self, now: float, avoid: Collection[DockerHost]) -> List[DockerHost]:
+        return [
+            host
+            for host in self.hosts
+            if host.running < host.capacity
+            and host.quarantined_until <= now
+            and host not in avoid
+        ]
+
+    def acquire(
+        self, dockerfile: str, avoid: Collection[DockerHost] = ()
+    ) -> Optional[DockerHost]:
+        """
+        Waits for a free host, other than those in `avoid`, and takes the best
+        one for `dockerfile`. A retry, avoiding some hosts, doesn't wait for
+        quarantines to end: None if every other host is quarantined.
+        """
+
+        key = self.key(dockerfile)
+
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                free = self._free(now, avoid)
+
+                if free:
+                    break
+
+                if avoid and all(
+                    host.quarantined_until > now
+                    for host in self.hosts
+                    if host not in avoid
+                ):
+                    return None
+
+                # quarantines end without anybody notifying
+                ends = [
+                    h.quarantined_until for h in self.hosts if h.quarantined_until > now
+                ]
+                self.cond.wait(min(ends) - now if ends else None)
+
+            host = max(free, key=lambda host: host.score(key))
+            host.running += 1
+
+            if key in host.built:
+                metrics.incr("hosts.cache_hits")
+
+        return host
+
+    def release(self, host: DockerHost, dockerfile: str, failed: bool = False):
+        """
+        Gives `host` back after building `dockerfile`, or failing to because
+        of the host if `failed`.
+        """
+
+        with self.cond:
+            host.running -= 1
+
+            if not failed:
+                host.failures = 0
+                host.remember_build(self.key(dockerfile))
+
+            else:
+                host.failures += 1
+                metrics.incr("hosts.failures")
+
+                if host.failures >= self.max_failures:
+                    times = host.failures - self.max_failures
+                    seconds = self.cooldown * 2 ** min(times, 6)
+                    host.quarantined_until = time.monotonic() + seconds
+                    metrics.incr("hosts.quarantined")
+                    logger.warning(
+                        "%s failed %d times in a row, leaving it out for %ss",
+                        host,
+                        host.failures,
+                        seconds,
+                    )
+
+            self.cond.notify_all()
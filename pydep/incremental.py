@@ -0,0 +1,242 @@
+"""
+Incremental re-search of a project searched before.
+
+`Incremental` keeps, per project and test setup, the last optimum, the
+versions known of each dependency, a fingerprint of the project's files that
+make it to the image and the results of every mapping evaluated. The next
+run searches only the dependencies that may now do better, starting from the
+previous optimum with every other dependency pinned to it:
+
+- dependencies with versions released since, as seen by `VersionsCache`;
+- if the project changed, also those whose optimum wasn't their newest
+  version, as the change may have been what held them back; and all of
+  them if the previous optimum doesn't pass any longer.
+
+While the project is unchanged, mappings evaluated before aren't evaluated
+again, their results are replayed from the history.
+"""
+
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from appdirs import user_cache_dir
+from packaging.version import Version
+
+from pydep.deps import Dependency
+from pydep.dockerpy import BuildContext
+from pydep.metrics import metrics
+from pydep.tests import TestRunner
+from pydep.versions import VersionMapping
+
+logger = logging.getLogger(__name__)
+
+# evaluations kept in the history, the most recent ones
+MAX_HISTORY = 20000
+
+Key = Tuple[Tuple[str, str], ...]
+
+
+def _key(mapping: VersionMapping) -> Key:
+    return tuple(sorted((dep.name, str(ver)) for dep, ver in mapping.items()))
+
+
+def fingerprint(project: Path, excludes: Sequence[str] = ()) -> Dict[str, str]:
+    """
+    The sha256 of each file of `project` in its build context with
+    `excludes`, by relative path; files left out of the image don't count.
+    """
+
+    return {
+        path: hashlib.sha256((project / path).read_bytes()).hexdigest()
+        for path in BuildContext(project, excludes).files()
+    }
+
+
+@dataclass
+class State:
+    """What a search left for the next one, as stored in JSON."""
+
+    pyver: str = ""
+    # dependency name -> versions known
+    versions: Dict[str, List[str]] = field(default_factory=dict)
+    # dependency name -> version, of the optimum found
+    optimum: Dict[str, str] = field(default_factory=dict)
+    files: Dict[str, str] = field(default_factory=dict)
+    # evaluated mappings, as [[[name, version], ...], results]
+    history: List[list] = field(default_factory=list)
+
+
+class MemoRunner(TestRunner):
+    """
+    Runs mappings of some dependencies through `runner` with the rest pinned
+    as in `fixed`, replaying the results of full mappings in `history` and
+    recording the new ones there.
+    """
+
+    def __init__(
+        self,
+        runner: TestRunner,
+        fixed: VersionMapping,
+        history: Dict[Key, List[bool]],
+    ) -> None:
+        super().__init__(runner.tests)
+        self.runner = runner
+        self.fixed = fixed
+        self.history = history
+
+    def run_all(self, pinned_vers: VersionMapping) -> List[bool]:
+        return self.run_batch([pinned_vers])[0]
+
+    def run_batch(self, mappings: Sequence[VersionMapping]) -> List[List[bool]]:
+        full = [{**self.fixed, **pinned_vers} for pinned_vers in mappings]
+        keys = [_key(mapping) for mapping in full]
+
+        pending = {}
+        for key, mapping in zip(keys, full):
+            if key not in self.history:
+                pending.setdefault(key, mapping)
+
+        metrics.incr("incremental.replayed", len(keys) - len(pending))
+
+        if pending:
+            results = self.runner.run_batch(list(pending.values()))
+            self.history.update(zip(pending, results))
+
+        return [self.history[key] for key in keys]
+
+
+@dataclass
+class Plan:
+    """What to search: `deps`, from `inimapping`, with `runner`."""
+
+    deps: List[Dependency]
+    inimapping: VersionMapping
+    runner: MemoRunner
+
+    def full(self, mapping: VersionMapping) -> VersionMapping:
+        """`mapping` of the searched dependencies with the rest pinned."""
+
+        return {**self.runner.fixed, **mapping}
+
+
+class Incremental:
+    """
+    The state of the searches identified by `setup`, e.g. the project's path
+    and the test command, kept in `path`, by default in the user's cache.
+    The project is fingerprinted without the files matching `excludes`, as
+    its build context.
+    """
+
+    def __init__(
+        self,
+        project: Path,
+        setup: Sequence[str],
+        path: Optional[Path] = None,
+        excludes: Sequence[str] = (),
+    ):
+        self.project = project
+
+        if path is None:
+            digest = hashlib.sha256("\0".join(setup).encode()).hexdigest()[:16]
+            path = (
+                Path(user_cache_dir(appname="pydep")) / "incremental" / f"{digest}.json"
+            )
+
+        self.path = path
+        self.previous: Optional[State] = None
+
+        if path.exists():
+            self.previous = State(**json.loads(path.read_text()))
+
+        self.files = fingerprint(project, excludes)
+        self.history: Dict[Key, List[bool]] = {}
+
+        if self.previous is not None and self.previous.files == self.files:
+            for pins, results in self.previous.history:
+                self.history[tuple(map(tuple, pins))] = results  # type: ignore
+
+    def refresh_versions(self, cache_min_year: int = 2018):
+        """
+        Fetches anew the versions of the dependencies searched before, so
+        `VersionsCache` sees what was released since.
+        """
+
+        if self.previous is None or not self.previous.pyver:
+            return
+
+        from pydep.vercache import VersionsCache
+
+        versions_cache = VersionsCache(Version(self.previous.pyver), cache_min_year)
+        versions_cache.fetch_versions(list(self.previous.versions), check_cache=False)
+
+    def plan(self, mapping: VersionMapping, runner: TestRunner) -> Plan:
+        """
+        What to search given the initial `mapping`, evaluating through
+        `runner` the previous optimum; everything from `mapping` if there
+        was no previous search.
+        """
+
+        prev = self.previous
+        memo = MemoRunner(runner, {}, self.history)
+
+        if prev is None:
+            return Plan(list(mapping), mapping, memo)
+
+        if prev.files != self.files:
+            logger.info("The project changed since the last search")
+
+        optimum = {}
+        grown = []
+        for dep, ver in mapping.items():
+            known = prev.versions.get(dep.name)
+
+            if known is None or {str(v) for v in dep.versions} - set(known):
+                grown.append(dep)
+
+            optimum[dep] = (
+                Version(prev.optimum[dep.name]) if dep.name in prev.optimum else ver
+            )
+
+        logger.info(
+            "New versions of %s", ", ".join(dep.name for dep in grown) or "none"
+        )
+
+        passes = all(memo.run_all(optimum))
+        deps = grown
+
+        if not passes:
+            logger.info("The previous optimum fails now, searching everything")
+            deps = list(mapping)
+
+        elif prev.files != self.files:
+            deps = [
+                dep
+                for dep in mapping
+                if dep in grown or dep.spversions and optimum[dep] < dep.spversions[-1]
+            ]
+
+        memo.fixed = {dep: ver for dep, ver in optimum.items() if dep not in deps}
+        metrics.observe("incremental.searched", len(deps))
+
+        return Plan(deps, {dep: optimum[dep] for dep in deps}, memo)
+
+    def save(self, mapping: VersionMapping, optimum: VersionMapping, pyver: str):
+        """Stores the state after searching from the initial `mapping`."""
+
+        history = [[list(key), res] for key, res in self.history.items()]
+
+        state = State(
+            pyver=pyver,
+            versions={dep.name: [str(v) for v in dep.versions] for dep in mapping},
+            optimum={dep.name: str(ver) for dep, ver in optimum.items()},
+            files=self.files,
+            history=history[-MAX_HISTORY:],
+        )
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(asdict(state)))
+        logger.info("Saved the search state in %s", self.path)
@@ -1,4 +1,21 @@
+import enum
+import json
 import logging
+from pathlib import Path
+from typing import Optional
+
+FORMAT = "{levelname} ({module}:{lineno}): {message}"
+
+
+class LogLevels(str, enum.Enum):
+    debug = "DEBUG"
+    info = "INFO"
+    warning = "WARNING"
+    error = "ERROR"
+
+
+# attributes every LogRecord has, anything else was passed with `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
 
 
 def stream_logger(name: str, level: int = logging.DEBUG):
@@ -9,8 +26,56 @@ def stream_logger(name: str, level: int = logging.DEBUG):
 
 def configure_logger(logger, level: int = logging.DEBUG):
     handler = logging.StreamHandler()
-    handler.setFormatter(
-        logging.Formatter(fmt="{levelname} ({module}:{lineno}): {message}", style="{")
-    )
+    handler.setFormatter(logging.Formatter(fmt=FORMAT, style="{"))
     logger.addHandler(handler)
     logger.setLevel(level)
+
+
+class JsonLinesHandler(logging.Handler):
+    """
+    Writes each record as a JSON line with its time, level, logger and
+    message, plus the fields given with `extra`, e.g.
+    `logger.debug("improved", extra={"cost": cost})`.
+    """
+
+    def __init__(self, path: Path, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self.fd = path.open("w")
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            event = {
+                "time": record.created,
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+            }
+
+            for key, val in vars(record).items():
+                if key not in _RECORD_ATTRS:
+                    event[key] = val
+
+            self.fd.write(json.dumps(event, default=str) + "\n")
+            self.fd.flush()
+
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.fd.close()
+        super().close()
+
+
+def setup_logging(level: int = logging.INFO, json_path: Optional[Path] = None):
+    """
+    Configures the `pydep` logger, parent of every logger of the package, to
+    write records of at least `level` to stderr and, if `json_path` is given,
+    as JSON lines to that file. Messages are formatted only if some handler
+    is going to emit them, so debug logging is almost free when disabled.
+    """
+
+    logger = logging.getLogger("pydep")
+    configure_logger(logger, level)
+
+    if json_path is not None:
+        logger.addHandler(JsonLinesHandler(json_path))
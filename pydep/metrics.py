@@ -0,0 +1,147 @@
+"""
+Counters, timing histograms and the optimizer improvement timeline of a run.
+
+Everything goes through the module level `metrics` object, which is disabled
+by default: then `timer` hands back a shared no-op context manager and the
+other methods return right away, so instrumented code pays for a method call
+and a flag check only.
+"""
+
+import atexit
+from contextlib import contextmanager, nullcontext
+import json
+from pathlib import Path
+import time
+from typing import Any, Dict, List, Optional
+
+_NULL = nullcontext()
+
+
+class Histogram:
+    """Timings bucketed by powers of two of milliseconds, plus their totals."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets: Dict[int, int] = {}
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        bucket = max(0, int(value * 1000)).bit_length()
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0,
+            "min": self.min if self.count else 0,
+            "max": self.max,
+            # upper bound in ms of each bucket -> observations
+            "buckets_ms": {
+                str((1 << b) - 1 if b else 0): n
+                for b, n in sorted(self.buckets.items())
+            },
+        }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.start = time.perf_counter()
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.timeline: List[Dict[str, Any]] = []
+
+    def enable(self, dump_to: Optional[Path] = None):
+        """Starts collecting, dumping everything as JSON to `dump_to` at exit."""
+
+        self.enabled = True
+        self.reset()
+
+        if dump_to is not None:
+            atexit.register(self.dump, dump_to)
+
+    def incr(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float):
+        if not self.enabled:
+            return
+
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+
+        hist.observe(value)
+
+    def timer(self, name: str):
+        """Context manager observing the time spent inside it in histogram `name`."""
+
+        if not self.enabled:
+            return _NULL
+
+        return self._timer(name)
+
+    @contextmanager
+    def _timer(self, name: str):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def improvement(self, cost: Any):
+        """Records that the optimum improved to `cost`."""
+
+        if not self.enabled:
+            return
+
+        self.timeline.append(
+            {
+                "time": time.perf_counter() - self.start,
+                "evaluations": self.counters.get("evaluations", 0),
+                "cost": cost,
+            }
+        )
+
+    def to_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        counters = self.counters
+
+        rates = {"evaluations_per_sec": counters.get("evaluations", 0) / elapsed}
+        for name in counters:
+            if not name.endswith(".hits"):
+                continue
+
+            prefix = name[: -len(".hits")]
+            total = counters[name] + counters.get(f"{prefix}.misses", 0)
+            rates[f"{prefix}.hit_rate"] = counters[name] / total if total else 0
+
+        return {
+            "elapsed": elapsed,
+            "counters": dict(counters),
+            "rates": rates,
+            "timings": {k: v.to_dict() for k, v in self.histograms.items()},
+            "improvements": self.timeline,
+        }
+
+    def dump(self, path: Path):
+        with path.open("w") as fd:
+            json.dump(self.to_dict(), fd, indent=2, default=str)
+
+
+metrics = Metrics()
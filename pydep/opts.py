@@ -1,4 +1,6 @@
-from typing import Tuple
+import bisect
+from typing import Any, List, Sequence, Tuple
+from pydep.metrics import metrics
 from pydep.versions import VersionMapping
 
 AlgorithmOutput = Tuple[float, VersionMapping]
@@ -28,9 +30,90 @@ class Max(Optimizer):
     def relax(self, cost: float, mapping: VersionMapping):
         if self.opt is None or cost > self.opt:
             self.opt, self.mapping = cost, mapping
+            metrics.improvement(cost)
 
 
 class Min(Optimizer):
     def relax(self, cost: float, mapping: VersionMapping):
         if self.opt is None or cost < self.opt:
             self.opt, self.mapping = cost, mapping
+            metrics.improvement(cost)
+
+
+class Pareto(Optimizer):
+    """
+    Archive of the non-dominated costs, tuples with an objective each, and
+    their mappings. `senses` tells whether to maximize (1) or minimize (-1)
+    each objective. `opt` and `mapping` are the point of the front best on
+    the first objective, `front` is all of it.
+
+    With two objectives the front, sorted by the first one, is sorted the
+    other way by the second, so checking a point and inserting it is a
+    binary search plus removing the run of points it dominates.
+    """
+
+    def __init__(self, senses: Sequence[int] = (1, -1)) -> None:
+        super().__init__()
+        self.senses = tuple(senses)
+        # costs as maximized, the first objective ascending; and the points
+        self.keys: List[Tuple[float, ...]] = []
+        self.points: List[Tuple[Any, VersionMapping]] = []
+        # for two objectives, the first and the negated second of `keys`
+        self._xs: List[float] = []
+        self._negys: List[float] = []
+
+    def relax(self, cost: Tuple[float, ...], mapping: VersionMapping):  # type: ignore
+        key = tuple(s * c for s, c in zip(self.senses, cost))
+
+        if len(key) == 2:
+            inserted = self._relax2(key, cost, mapping)
+        else:
+            inserted = self._relaxn(key, cost, mapping)
+
+        if inserted:
+            self.opt, self.mapping = self.points[-1]
+            metrics.improvement(cost)
+
+    def _relax2(self, key, cost, mapping) -> bool:
+        x, y = key
+
+        # the point with the highest second objective among those at least
+        # as good on the first is the leftmost of them
+        i = bisect.bisect_left(self._xs, x)
+        if i < len(self.keys) and self.keys[i][1] >= y:
+            return False
+
+        # dominated points: no better on the first, so left of `hi`, and no
+        # better on the second, a run ending there
+        hi = bisect.bisect_right(self._xs, x)
+        lo = bisect.bisect_left(self._negys, -y, 0, hi)
+
+        self.keys[lo:hi] = [key]
+        self.points[lo:hi] = [(cost, mapping)]
+        self._xs[lo:hi] = [x]
+        self._negys[lo:hi] = [-y]
+
+        return True
+
+    def _relaxn(self, key, cost, mapping) -> bool:
+        def dominates(a, b):
+            return all(p >= q for p, q in zip(a, b))
+
+        if any(dominates(other, key) for other in self.keys):
+            return False
+
+        kept = [i for i, other in enumerate(self.keys) if not dominates(key, other)]
+        self.keys = [self.keys[i] for i in kept]
+        self.points = [self.points[i] for i in kept]
+
+        i = bisect.bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.points.insert(i, (cost, mapping))
+
+        return True
+
+    @property
+    def front(self) -> List[Tuple[Any, VersionMapping]]:
+        """The non-dominated points, best on the first objective first."""
+
+        return self.points[::-1]
@@ -1,46 +1,135 @@
-from copy import deepcopy
-from typing import Tuple, List
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
 from packaging.version import Version
 from packaging.requirements import Requirement
 from packaging.specifiers import SpecifierSet
+import tomli
+
 from pydep.deps import Dependency
 from pydep.tests import VirtualTest
 from pydep.versions import VersionRange
 
+ParsedConfig = Tuple[List[Dependency], List[VirtualTest], List[Version]]
+
+# suffix of a testcase in JSON lines, telling it apart from the JSON lines
+# files of `pydep batch` and `bench`, which hold a whole testcase per line
+CASE_SUFFIX = ".case.jsonl"
+
+
+class Interner:
+    """
+    Shared `Version` and `VersionRange` objects for repeated strings, so a
+    config takes memory for its distinct versions rather than its clauses.
+    """
+
+    def __init__(self) -> None:
+        self.versions: Dict[str, Version] = {}
+        self.ranges: Dict[Tuple[str, str], VersionRange] = {}
+
+    def version(self, s: str) -> Version:
+        ver = self.versions.get(s)
+
+        if ver is None:
+            ver = self.versions[s] = Version(s)
+
+        return ver
 
-def parse_virtual_config(
-    d: dict,
-) -> Tuple[List[Dependency], List[VirtualTest], List[Version]]:
-    d = deepcopy(d)
+    def range(self, lo: str, hi: str) -> VersionRange:
+        key = (lo, hi)
+        rng = self.ranges.get(key)
 
+        if rng is None:
+            rng = self.ranges[key] = VersionRange(self.version(lo), self.version(hi))
+
+        return rng
+
+
+def parse_dependencies(
+    d: Dict[str, dict], interner: Interner
+) -> Tuple[List[Dependency], List[Version]]:
     deps = []
-    who = {}
     inivers = []
-    for name, vals in d["dependencies"].items():
-        vals["versions"] = list(map(Version, vals["versions"]))
-        vals["specifier"] = SpecifierSet(vals["specifier"])
-        vals["org_req"] = Requirement(f"{name}{vals['specifier']}")
-        vals.pop("specifier")
-
-        iniver = vals.pop("iniver")
-        inivers.append(Version(iniver))
-        assert inivers[-1] in vals["versions"]
-
-        dep = Dependency(name, **vals)
-        who[dep.name] = dep
-        deps.append(dep)
-
-    tests = []
-    for test in d["tests"]:
-        true_when = []
-        for cond in test["true_when"]:
-            dep_cond = {}
-            for key in cond:
-                x, y = map(Version, cond[key])
-                dep_cond[who[key]] = VersionRange(x, y)
-
-            true_when.append(dep_cond)
-
-        tests.append(VirtualTest(true_when))
+    for name, vals in d.items():
+        versions = [interner.version(ver) for ver in vals["versions"]]
+        specifier = SpecifierSet(vals["specifier"])
+
+        inivers.append(interner.version(vals["iniver"]))
+        assert inivers[-1] in versions
+
+        deps.append(Dependency(name, versions, Requirement(f"{name}{specifier}")))
+
+    return deps, inivers
+
+
+def parse_test(
+    test: dict, who: Dict[str, Dependency], interner: Interner
+) -> VirtualTest:
+    true_when = []
+    for cond in test["true_when"]:
+        true_when.append(
+            {who[key]: interner.range(*cond[key]) for key in cond}  # type: ignore
+        )
+
+    return VirtualTest(true_when)
+
+
+def parse_virtual_config(d: dict) -> ParsedConfig:
+    """Parses a virtual config, without modifying or copying `d`."""
+
+    interner = Interner()
+    deps, inivers = parse_dependencies(d["dependencies"], interner)
+    who = {dep.name: dep for dep in deps}
+
+    tests = [parse_test(test, who, interner) for test in d["tests"]]
+
+    return deps, tests, inivers
+
+
+def iter_jsonl_tests(
+    lines: Iterable[str], who: Dict[str, Dependency], interner: Interner
+) -> Iterator[VirtualTest]:
+    """Tests of JSON `lines`, a test per line, parsed one at a time."""
+
+    for line in lines:
+        if line.strip():
+            yield parse_test(json.loads(line), who, interner)
+
+
+def load_virtual_config(path: Path) -> ParsedConfig:
+    """
+    Loads a virtual config, either a TOML file or a JSON lines one, named
+    `*.case.jsonl`, whose first line holds the dependencies and each later
+    line a test. A TOML config may keep its tests apart in `tests_file`, a
+    JSON lines file with a test per line, relative to it. JSON lines are read
+    one at a time, so only the current test is held unparsed in memory.
+    """
+
+    interner = Interner()
+
+    if path.name.endswith(CASE_SUFFIX):
+        with path.open() as fd:
+            header = json.loads(fd.readline())
+            deps, inivers = parse_dependencies(header["dependencies"], interner)
+            who = {dep.name: dep for dep in deps}
+            return deps, list(iter_jsonl_tests(fd, who, interner)), inivers
+
+    if path.suffix == ".jsonl":
+        raise ValueError(
+            f"{path} isn't a testcase, a JSON lines one is named *{CASE_SUFFIX}; "
+            "files with a testcase per line are for `pydep batch` and `bench`"
+        )
+
+    with path.open("rb") as fd:
+        d = tomli.load(fd)
+
+    deps, inivers = parse_dependencies(d["dependencies"], interner)
+    who = {dep.name: dep for dep in deps}
+    tests = [parse_test(test, who, interner) for test in d.get("tests", [])]
+
+    if "tests_file" in d:
+        with (path.parent / d["tests_file"]).open() as fd:
+            tests.extend(iter_jsonl_tests(fd, who, interner))
 
     return deps, tests, inivers
@@ -0,0 +1,229 @@
+"""
+Pins of the transitive dependencies of a candidate, resolved locally.
+
+Searching only over the top level dependencies leaves pip to pick the
+versions of everything they require, differently from one build to the
+next as new releases come out. Searching over every installed package
+instead blows up the space. `Resolver` keeps the search over the top level
+dependencies and, for each candidate, derives versions of the transitive
+ones compatible with it from the `Requires-Dist` of each release, cached
+by `VersionsCache`: it keeps the installed versions where they still fit
+and moves the others to the newest version allowed, as pip would.
+"""
+
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import Version
+
+from pydep.deps import Dependency
+from pydep.metrics import metrics
+from pydep.vercache import VersionsCache
+from pydep.versions import VersionMapping, parse_freeze
+
+logger = logging.getLogger(__name__)
+
+
+class ResolutionConflict(Exception):
+    """The top level versions of a candidate can't be installed together."""
+
+
+class Resolver:
+    """
+    Resolves the transitive dependencies `transitive`, mapped to the versions
+    installed initially, of candidates for the top level dependencies.
+    Markers are evaluated for python `pyver`.
+    """
+
+    def __init__(
+        self,
+        transitive: VersionMapping,
+        versions_cache: VersionsCache,
+        pyver: str,
+        max_rounds: int = 10,
+    ) -> None:
+        self.transitive = transitive
+        self.deps = {canonicalize_name(dep.name): dep for dep in transitive}
+        self.initial = {
+            canonicalize_name(dep.name): ver for dep, ver in transitive.items()
+        }
+        self.versions_cache = versions_cache
+        self.max_rounds = max_rounds
+
+        self.env = default_environment()
+        self.env.update(python_version=".".join(pyver.split(".")[:2]))
+        self.env.update(python_full_version=pyver)
+
+    @classmethod
+    def from_freeze(
+        cls,
+        inimapping: VersionMapping,
+        freeze: str,
+        pyver: str,
+        cache_min_year: int = 2018,
+    ) -> "Resolver":
+        """
+        Resolver of the packages in the `pip freeze` output `freeze` that
+        aren't top level dependencies in `inimapping`.
+        """
+
+        top = {canonicalize_name(dep.name) for dep in inimapping}
+        pins = {
+            name: ver
+            for name, ver in parse_freeze(freeze).items()
+            if canonicalize_name(name) not in top
+        }
+
+        versions_cache = VersionsCache(Version(pyver), loyear=cache_min_year)
+        versions = versions_cache.fetch_versions(list(pins))
+
+        transitive = {
+            Dependency(name, versions[name], Requirement(name)): Version(ver)
+            for name, ver in pins.items()
+        }
+        logger.info("Resolving %d transitive dependencies", len(transitive))
+
+        return cls(transitive, versions_cache, pyver)
+
+    def _requirements(self, dep: str, reqs: List[str], extras: Set[str]):
+        """The requirements of `reqs`, of `dep` with `extras`, applying here."""
+
+        for line in reqs:
+            try:
+                req = Requirement(line)
+            except InvalidRequirement:
+                logger.debug("Ignoring invalid requirement %r of %s", line, dep)
+                continue
+
+            if req.marker is not None and not any(
+                req.marker.evaluate({**self.env, "extra": extra})
+                for extra in extras | {""}
+            ):
+                continue
+
+            yield req
+
+    def _constraints(
+        self, pinned: Dict[str, Version], extras: Dict[str, Set[str]]
+    ) -> Dict[str, List[Tuple[str, SpecifierSet]]]:
+        """
+        What the releases of `pinned` require, by dependency: who asks for it
+        and the specifier it asks for. Extras requested meanwhile are added to
+        `extras`.
+        """
+
+        metadata = self.versions_cache.fetch_requires(
+            [(dep, str(ver)) for dep, ver in pinned.items()]
+        )
+
+        constraints: Dict[str, List[Tuple[str, SpecifierSet]]] = {}
+        for dep, ver in pinned.items():
+            reqs = metadata[(dep, str(ver))]
+
+            for req in self._requirements(dep, reqs, extras.get(dep, set())):
+                name = canonicalize_name(req.name)
+                constraints.setdefault(name, []).append((dep, req.specifier))
+
+                if req.extras:
+                    extras.setdefault(name, set()).update(req.extras)
+
+        return constraints
+
+    def resolve(self, pinned_vers: VersionMapping) -> VersionMapping:
+        """
+        Versions of the transitive dependencies to install along the top level
+        ones of `pinned_vers`. Those no cached version fits are left out, for
+        pip to pick. A transitive dependency excluding a top level version is
+        moved to its newest version. Raises `ResolutionConflict` if the top
+        level versions contradict what a top level one or the newest version
+        of a transitive one requires.
+        """
+
+        top = {canonicalize_name(dep.name): ver for dep, ver in pinned_vers.items()}
+        chosen = dict(self.initial)
+        extras: Dict[str, Set[str]] = {
+            canonicalize_name(dep.name): set(dep.org_req.extras) for dep in pinned_vers
+        }
+
+        with metrics.timer("resolver.resolve"):
+            for _ in range(self.max_rounds):
+                pinned = {**chosen, **top}
+                constraints = self._constraints(pinned, extras)
+                changed = False
+
+                for name, reqs in constraints.items():
+                    if name in top:
+                        changed |= self._settle_top(name, top[name], reqs, chosen)
+                        continue
+
+                    spec = SpecifierSet()
+                    for _, req_spec in reqs:
+                        spec &= req_spec
+
+                    if name not in chosen or spec.contains(
+                        chosen[name], prereleases=True
+                    ):
+                        continue
+
+                    ver = self._newest(name, spec)
+
+                    if ver is None:
+                        logger.debug("No version of %s satisfies %s", name, spec)
+                        del chosen[name]
+                    else:
+                        chosen[name] = ver
+
+                    changed = True
+
+                if not changed:
+                    break
+
+            else:
+                logger.warning(
+                    "Transitive dependencies didn't settle after %d rounds",
+                    self.max_rounds,
+                )
+
+        moved = sum(self.initial[name] != ver for name, ver in chosen.items())
+        metrics.observe("resolver.moved", moved)
+
+        return {self.deps[name]: ver for name, ver in chosen.items()}
+
+    def _settle_top(
+        self,
+        name: str,
+        ver: Version,
+        reqs: List[Tuple[str, SpecifierSet]],
+        chosen: Dict[str, Version],
+    ) -> bool:
+        """
+        Moves the transitive dependencies in `chosen` whose requirements
+        `reqs` exclude the top level version `name==ver` to their newest
+        version, whether any moved.
+        """
+
+        changed = False
+        for who, spec in reqs:
+            if spec.contains(ver, prereleases=True):
+                continue
+
+            newest = self._newest(who, SpecifierSet()) if who in chosen else None
+
+            if newest is None or newest == chosen[who]:
+                metrics.incr("resolver.conflicts")
+                raise ResolutionConflict(
+                    f"{name}=={ver} doesn't satisfy {spec}, required by {who}"
+                )
+
+            chosen[who] = newest
+            changed = True
+
+        return changed
+
+    def _newest(self, name: str, spec: SpecifierSet) -> Optional[Version]:
+        allowed = list(spec.filter(self.deps[name].versions))
+        return max(allowed) if allowed else None
@@ -0,0 +1,25 @@
+"""
+Seeds of independent random streams.
+
+Every solver draws from its own `random.Random`, so solvers running in the
+same process, in threads or in worker processes don't share any state. The
+stream of a unit of work, a benchmark job or a case of a batch, is seeded
+from the run's seed plus whatever identifies that unit, so it's the same no
+matter which worker runs it or in which order.
+"""
+
+import hashlib
+import random
+
+
+def derive_seed(seed: int, *key) -> int:
+    """A 64 bits seed derived from `seed` and the parts of `key`."""
+
+    data = ":".join(map(str, (seed,) + key)).encode()
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+
+
+def substream(seed: int, *key) -> random.Random:
+    """The stream of the unit of work `key` of a run seeded with `seed`."""
+
+    return random.Random(derive_seed(seed, *key))
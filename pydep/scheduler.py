@@ -0,0 +1,224 @@
+"""
+Limits on what the evaluations of candidates take from each docker host.
+
+Building a candidate runs pip, which may compile extensions, and testing it
+runs the project's test suite; doing either for several candidates at once
+without bounds can exhaust the memory of a host, and every candidate image
+kept takes disk. `Scheduler` caps the concurrent builds and test containers
+of each host separately, and keeps an `ImageLRU` per host removing the least
+recently used candidate images beyond a disk budget.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+import logging
+import threading
+from typing import Dict, Iterator, Optional, Union
+
+import docker
+import docker.errors
+import docker.utils
+
+from pydep.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _bytes(value: Union[int, str, None]) -> Optional[int]:
+    return None if value is None else docker.utils.parse_bytes(value)
+
+
+@dataclass
+class Limits:
+    """
+    What evaluating candidates may take from each host: `builds` and `tests`
+    containers at a time, by default as many as candidates; `memory`, e.g.
+    "2g", and `cpus` for each of those containers; and `disk` of candidate
+    images, beyond which the least recently used ones are removed.
+    """
+
+    builds: Optional[int] = None
+    tests: Optional[int] = None
+    memory: Union[int, str, None] = None
+    cpus: Optional[float] = None
+    disk: Union[int, str, None] = None
+
+    def __post_init__(self):
+        self.memory = _bytes(self.memory)
+        self.disk = _bytes(self.disk)
+
+    def run_kwargs(self) -> dict:
+        """Keyword arguments of `containers.create` limiting the container."""
+
+        kwargs: dict = {}
+
+        if self.memory is not None:
+            kwargs.update(mem_limit=self.memory, memswap_limit=self.memory)
+
+        if self.cpus is not None:
+            kwargs.update(nano_cpus=int(self.cpus * 1e9))
+
+        return kwargs
+
+    def build_limits(self) -> dict:
+        """`container_limits` of a build."""
+
+        limits: dict = {}
+
+        if self.memory is not None:
+            limits.update(memory=self.memory, memswap=self.memory)
+
+        if self.cpus is not None:
+            limits.update(cpuperiod=100_000, cpuquota=int(self.cpus * 100_000))
+
+        return limits
+
+
+class ImageLRU:
+    """
+    The candidate images of `client`, removing the least recently used ones
+    not in use while they take more than `budget` bytes, if any. Images are
+    accounted for their size beyond the one of `base`, the image they are
+    built from.
+    """
+
+    def __init__(
+        self, client: docker.DockerClient, budget: Optional[int], base: str
+    ) -> None:
+        self.client = client
+        self.budget = budget
+        self.base = base
+        self.shared: Optional[int] = None
+        self.images: "OrderedDict[str, int]" = OrderedDict()
+        self.users: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, tag: str):
+        """
+        Starts using the image `tag`, before building it, so an identical
+        image already there isn't removed meanwhile.
+        """
+
+        with self.lock:
+            self.users[tag] = self.users.get(tag, 0) + 1
+
+    def use(self, tag: str):
+        """Accounts for the image `tag`, reserved and just built."""
+
+        if self.shared is None:
+            # only pulled by the first build
+            self.shared = self.client.api.inspect_image(self.base)["Size"]
+
+        size = self.client.api.inspect_image(tag)["Size"] - self.shared
+
+        with self.lock:
+            self.images[tag] = max(size, 0)
+            self.images.move_to_end(tag)
+            self._evict()
+
+    def release(self, tag: str):
+        with self.lock:
+            self.users[tag] -= 1
+
+            if not self.users[tag]:
+                del self.users[tag]
+
+            self._evict()
+
+    def _evict(self):
+        total = sum(self.images.values())
+        metrics.observe("images.bytes", total)
+
+        if self.budget is None:
+            return
+
+        for tag in list(self.images):
+            if total <= self.budget:
+                break
+
+            if self.users.get(tag):
+                continue
+
+            if self._remove(tag):
+                total -= self.images.pop(tag)
+                metrics.incr("images.evicted")
+
+    def _remove(self, tag: str) -> bool:
+        try:
+            self.client.images.remove(tag)
+        except docker.errors.APIError as err:
+            logger.debug("Can't remove %s yet: %s", tag, err)
+            return False
+
+        return True
+
+    def clear(self):
+        """Removes every image not in use."""
+
+        with self.lock:
+            for tag in list(self.images):
+                if not self.users.get(tag) and self._remove(tag):
+                    del self.images[tag]
+
+
+@contextmanager
+def _holding(semaphore: Optional[threading.Semaphore], waited: str) -> Iterator[None]:
+    if semaphore is None:
+        yield
+        return
+
+    with metrics.timer(waited):
+        semaphore.acquire()
+
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+class HostResources:
+    """The semaphores and candidate images of a host under `limits`."""
+
+    def __init__(self, client: docker.DockerClient, limits: Limits, base: str):
+        self.builds = self.tests = None
+
+        if limits.builds:
+            self.builds = threading.BoundedSemaphore(limits.builds)
+
+        if limits.tests:
+            self.tests = threading.BoundedSemaphore(limits.tests)
+
+        self.images = ImageLRU(client, limits.disk, base)  # type: ignore
+
+    def building(self):
+        return _holding(self.builds, "scheduler.build_wait")
+
+    def testing(self):
+        return _holding(self.tests, "scheduler.test_wait")
+
+
+class Scheduler:
+    """
+    Limits the evaluations of candidates on each host to `limits`. Images are
+    accounted for beyond the size of `base`, the image candidates build from.
+    """
+
+    def __init__(self, limits: Limits, base: str) -> None:
+        self.limits = limits
+        self.base = base
+        self._hosts: Dict[object, HostResources] = {}
+        self._lock = threading.Lock()
+
+    def of(self, host) -> HostResources:
+        """The resources of the `pydep.hosts.DockerHost` `host`."""
+
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostResources(host.client, self.limits, self.base)
+
+            return self._hosts[host]
+
+    def close(self):
+        for resources in self._hosts.values():
+            resources.images.clear()
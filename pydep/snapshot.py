@@ -0,0 +1,473 @@
+"""
+Runners applying candidates in place to environments where the project is
+already installed, instead of building an image per candidate.
+
+Each `Slot` is one such environment: a long-lived container or, for trusted
+projects, a local virtual environment. After installing the project, a slot
+takes a snapshot of its `pip freeze`. A candidate is then installed as it
+would be over the initial image: whatever earlier candidates added or moved,
+transitive packages included, goes back to the snapshot and the candidate's
+pins are installed on top, pip skipping those already satisfied. What a slot
+has is read back from `pip freeze` after each install.
+"""
+
+import logging
+import os
+from pathlib import Path
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from packaging.utils import canonicalize_name
+from packaging.version import Version
+
+from pydep.depsmgr import DepsManager
+from pydep.metrics import metrics
+from pydep.tests import EarlyStop, ExternalRunner, TestCmd
+from pydep.versions import VersionMapping, parse_freeze
+
+logger = logging.getLogger(__name__)
+
+# left out of the copies of the project the virtual environments run from
+COPY_IGNORE = (".git", ".hg", ".svn", ".venv", "venv", ".tox", ".nox", "build")
+COPY_IGNORE += ("dist", ".mypy_cache", ".pytest_cache", "__pycache__", "*.py[cod]")
+
+
+def _names(freeze: str) -> Set[str]:
+    """The names of the packages in the `pip freeze` output `freeze`."""
+
+    names = set()
+    for line in freeze.split("\n"):
+        line = line.strip()
+
+        if line and not line.startswith(("#", "-")):
+            names.add(canonicalize_name(re.split(r"\s*(?:===?|@)", line)[0]))
+
+    return names
+
+
+class Slot:
+    """An environment with the project installed where commands can run."""
+
+    # where `pip freeze` of the environment with the project installed is kept
+    snapshot: str
+
+    def __init__(self) -> None:
+        # versions currently installed of the dependencies searched
+        self.pinned: VersionMapping = {}
+        # the `pip freeze` output kept in `snapshot`, and the current one
+        self.frozen = ""
+        self.freeze = ""
+
+    def exec(self, cmd: str) -> Tuple[int, str]:
+        """Runs the shell command `cmd`, returns its exit code and output."""
+
+        raise NotImplementedError
+
+    def run_test(
+        self, cmd: str, early_stop: EarlyStop
+    ) -> Tuple[Optional[int], str, Optional[str], bool]:
+        """
+        Runs the test command `cmd` stopping it early as `early_stop` says:
+        its exit code, the last lines of its output, the line matching a
+        failure pattern and whether it timed out.
+        """
+
+        code, output = self.exec(cmd)
+        matched, output = early_stop.watch([output.encode()])
+        return code, output, matched, False
+
+    def close(self):
+        pass
+
+    def distance(self, pinned_vers: VersionMapping) -> int:
+        """Number of pins to install to get `pinned_vers` in this slot."""
+
+        return sum(self.pinned.get(dep) != ver for dep, ver in pinned_vers.items())
+
+
+class VenvSlot(Slot):
+    """
+    A virtual environment in the directory `root`, removed on close, running
+    commands from its own copy of the project, so slots don't share caches or
+    build artifacts. There is no isolation at all, so use it only with
+    projects you trust.
+    """
+
+    def __init__(self, project: Path, root: Path, python: str = sys.executable):
+        super().__init__()
+        self.root = root
+        self.project = root / "project"
+        self.snapshot = str(root / "pydep-snapshot.txt")
+
+        subprocess.run([python, "-m", "venv", str(root)], check=True)
+        shutil.copytree(
+            project, self.project, ignore=shutil.ignore_patterns(*COPY_IGNORE)
+        )
+
+        self.env = dict(os.environ)
+        self.env.pop("PYTHONHOME", None)
+        self.env.update(
+            PATH=f"{root / 'bin'}{os.pathsep}{os.environ.get('PATH', '')}",
+            VIRTUAL_ENV=str(root),
+            PYTHONPATH=str(self.project),
+            PIP_DISABLE_PIP_VERSION_CHECK="1",
+            PYTHONUNBUFFERED="1",
+        )
+
+    def exec(self, cmd: str) -> Tuple[int, str]:
+        proc = subprocess.run(
+            cmd,
+            shell=True,
+            cwd=self.project,
+            env=self.env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        return proc.returncode, proc.stdout.decode(errors="replace")
+
+    def run_test(
+        self, cmd: str, early_stop: EarlyStop
+    ) -> Tuple[Optional[int], str, Optional[str], bool]:
+        proc = subprocess.Popen(
+            cmd,
+            shell=True,
+            cwd=self.project,
+            env=self.env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+        def kill():
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        with proc, early_stop.deadline(kill) as expired:
+            matched, output = early_stop.watch(proc.stdout)  # type: ignore
+
+            if matched is not None:
+                kill()
+
+            code = proc.wait()
+
+        return code, output, matched, expired.is_set()
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class ContainerSlot(Slot):
+    """
+    A container, kept running, of an image with the project installed;
+    `kwargs` go to `containers.run`, e.g. resource limits.
+    """
+
+    snapshot = "/tmp/pydep-snapshot.txt"
+
+    def __init__(self, client, image: str, **kwargs) -> None:
+        super().__init__()
+        self.container = client.containers.run(
+            image, command="sleep infinity", detach=True, **kwargs
+        )
+
+    def exec(self, cmd: str) -> Tuple[int, str]:
+        code, output = self.container.exec_run(["/bin/sh", "-c", cmd])
+        return code, output.decode(errors="replace")
+
+    def run_test(
+        self, cmd: str, early_stop: EarlyStop
+    ) -> Tuple[Optional[int], str, Optional[str], bool]:
+        api = self.container.client.api
+        pidfile = "/tmp/pydep-test.pid"
+
+        # the shell records its pid and becomes the command, to kill it later
+        exec_id = api.exec_create(
+            self.container.id,
+            ["/bin/sh", "-c", f"echo $$ > {pidfile}; exec {cmd}"],
+            environment={"PYTHONUNBUFFERED": "1"},
+        )["Id"]
+
+        def kill():
+            self.container.exec_run(["/bin/sh", "-c", f"kill -9 $(cat {pidfile})"])
+
+        with early_stop.deadline(kill) as expired:
+            matched, output = early_stop.watch(api.exec_start(exec_id, stream=True))
+
+            if matched is not None:
+                kill()
+
+        code = api.exec_inspect(exec_id)["ExitCode"]
+        return code, output, matched, expired.is_set()
+
+    def close(self):
+        self.container.remove(force=True)
+
+
+class SnapshotRunner(ExternalRunner):
+    """
+    Runs candidates in a pool of `slots`, each candidate goes to the free
+    slot needing the fewest pins changed.
+    """
+
+    def __init__(
+        self,
+        project: Path,
+        depsmgr: DepsManager,
+        tests: Sequence[TestCmd],
+        slots: Sequence[Slot],
+    ) -> None:
+        super().__init__(project, depsmgr, tests)
+        self.slots = list(slots)
+        self.workers = len(self.slots)
+        self.free = list(slots)
+        self.cond = threading.Condition()
+        self.inimapping: VersionMapping = {}
+        # the initial versions of every package pinned, transitive ones too
+        self.inimapping_all: VersionMapping = {}
+
+    def init_deps_mapping(
+        self, top_level=True, cache_min_year: int = 2018, transitive: bool = False
+    ) -> VersionMapping:
+        from pydep.dockerpy import freeze_mapping
+
+        freeze, pyver = "", ""
+        for slot in self.slots:
+            code, output = slot.exec(self.depsmgr.cmd_init_pinned_deps())
+
+            if code != 0:
+                raise RuntimeError(f"Installing the project failed:\n{output}")
+
+            code, freeze = slot.exec(
+                f"pip freeze > {slot.snapshot} && cat {slot.snapshot}"
+            )
+
+            if code != 0:
+                raise RuntimeError(f"Taking the snapshot failed:\n{freeze}")
+
+            slot.frozen = freeze
+            code, pyver = slot.exec(
+                "python -c 'import platform; print(platform.python_version())'"
+            )
+
+            if code != 0:
+                raise RuntimeError(f"Probing the python version failed:\n{pyver}")
+
+        self.pyver = pyver.strip()
+        logger.info("Slots are running on Python %s", self.pyver)
+
+        self.inimapping = freeze_mapping(
+            self.project, freeze, pyver.strip(), top_level, cache_min_year
+        )
+        self.inimapping_all = self.inimapping
+
+        if transitive:
+            from pydep.resolver import Resolver
+
+            self.resolver = Resolver.from_freeze(
+                self.inimapping, freeze, pyver.strip(), cache_min_year
+            )
+            self.inimapping_all = {**self.resolver.transitive, **self.inimapping}
+
+        for slot in self.slots:
+            self.record_freeze(slot, slot.frozen)
+
+        return self.inimapping
+
+    def probe(self, code: str) -> str:
+        status, output = self.slots[0].exec(f"python -c {shlex.quote(code)}")
+
+        if status != 0:
+            raise RuntimeError(f"Probing the environment failed:\n{output}")
+
+        return output
+
+    def acquire(self, pinned_vers: VersionMapping) -> Slot:
+        with self.cond:
+            self.cond.wait_for(lambda: bool(self.free))
+            slot = min(self.free, key=lambda slot: slot.distance(pinned_vers))
+            self.free.remove(slot)
+
+        return slot
+
+    def release(self, slot: Slot):
+        with self.cond:
+            self.free.append(slot)
+            self.cond.notify()
+
+    def record_freeze(self, slot: Slot, freeze: str):
+        """Takes the `pip freeze` output `freeze` as what `slot` has."""
+
+        slot.freeze = freeze
+        installed = {
+            canonicalize_name(name): ver for name, ver in parse_freeze(freeze).items()
+        }
+
+        slot.pinned = {}
+        for dep in self.inimapping_all:
+            ver = installed.get(canonicalize_name(dep.name))
+
+            if ver is not None:
+                slot.pinned[dep] = Version(ver)
+
+    def sync(self, slot: Slot):
+        """Reads back what `slot` has installed."""
+
+        code, freeze = slot.exec("pip freeze")
+
+        if code != 0:
+            logger.error("Reading the packages of a slot failed: %s", freeze)
+
+        self.record_freeze(slot, freeze)
+
+    def restore_cmds(self, slot: Slot, keep: Set[str] = set()) -> List[str]:
+        """
+        The commands taking `slot` back to its snapshot, but for the packages
+        in `keep`: removing those added since and reinstalling those moved.
+        """
+
+        snapshot = {
+            canonicalize_name(name): ver
+            for name, ver in parse_freeze(slot.frozen).items()
+        }
+        installed = {
+            canonicalize_name(name): ver
+            for name, ver in parse_freeze(slot.freeze).items()
+        }
+
+        added = _names(slot.freeze) - _names(slot.frozen) - keep
+        moved: Dict[str, str] = {
+            name: ver
+            for name, ver in snapshot.items()
+            if name not in keep and installed.get(name) != ver
+        }
+
+        cmds = []
+        if added:
+            cmds.append(f"pip uninstall -y {' '.join(sorted(added))}")
+
+        if moved:
+            pins = [f"{name}=={ver}" for name, ver in sorted(moved.items())]
+            cmds.append(f"pip install {' '.join(pins)}")
+
+        return cmds
+
+    def rollback(self, slot: Slot):
+        """Takes `slot` back to its snapshot."""
+
+        logger.info("Rolling back slot to its snapshot")
+        metrics.incr("snapshot.rollbacks")
+
+        self.sync(slot)
+        cmds = self.restore_cmds(slot)
+
+        if cmds:
+            code, output = slot.exec(" && ".join(cmds))
+
+            if code != 0:
+                logger.error("Rolling back failed: %s", output)
+
+        self.sync(slot)
+
+    def run_all(self, pinned_vers: VersionMapping) -> List[bool]:
+        logger.info("Running tests")
+        metrics.incr("evaluations")
+
+        slot = self.acquire(pinned_vers)
+
+        try:
+            with metrics.timer("snapshot.evaluation"):
+                res = self._run_all(slot, pinned_vers)
+        finally:
+            self.release(slot)
+
+        if all(res):
+            metrics.incr("evaluations.passed")
+
+        return res
+
+    def _run_all(self, slot: Slot, pinned_vers: VersionMapping) -> List[bool]:
+        install = self.install_mapping(pinned_vers)
+
+        if install is None:
+            return [False] * len(self.tests)
+
+        diff = [dep for dep, ver in install.items() if slot.pinned.get(dep) != ver]
+        cmds = self.restore_cmds(slot, {canonicalize_name(dep.name) for dep in install})
+
+        if diff or cmds:
+            metrics.observe("snapshot.changed_pins", len(diff))
+
+            # every pin, as restoring the snapshot or installing the pins that
+            # differ may move the others
+            cmds.append(self.depsmgr.cmd_install_deps(install))
+
+            with metrics.timer("snapshot.install"):
+                code, output = slot.exec(" && ".join(cmds))
+
+            if code != 0:
+                logger.error(output)
+                self.rollback(slot)
+                return [False] * len(self.tests)
+
+            self.sync(slot)
+
+        res = []
+        for cmd in self.test_cmds(pinned_vers):
+            if cmd is None:
+                res.append(True)
+                continue
+
+            logger.debug("Running %s", cmd)
+
+            with metrics.timer("snapshot.test"):
+                code, output, matched, expired = slot.run_test(cmd, self.early_stop)
+
+            stopped = self.stopped(cmd, matched, expired)
+            success = code == 0 and not stopped
+
+            if not success:
+                if not stopped:
+                    logger.warning("%s exited with status %s: %s", cmd, code, output)
+
+                metrics.incr("snapshot.test_failures")
+
+            res.append(success)
+
+        self.record(pinned_vers, res)
+        return res
+
+    def close(self):
+        for slot in self.slots:
+            slot.close()
+
+
+def venv_slots(project: Path, n: int, python: str = sys.executable) -> List[Slot]:
+    """`n` fresh virtual environments, each in a temporary directory."""
+
+    logger.info("Creating %d virtual environment(s)", n)
+
+    return [
+        VenvSlot(project, Path(tempfile.mkdtemp(prefix="pydep-venv-")), python)
+        for _ in range(n)
+    ]
+
+
+def container_slots(runner, n: int) -> List[Slot]:
+    """
+    `n` containers of the initial image of the `DockerPyRunner` `runner`, with
+    the project and its initial dependencies installed.
+    """
+
+    img = runner.init_image()
+    kwargs = runner.scheduler.limits.run_kwargs()
+
+    return [ContainerSlot(runner.client, img, **kwargs) for _ in range(n)]
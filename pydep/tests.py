@@ -1,27 +1,38 @@
-from dataclasses import dataclass
+from array import array
+import bisect
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import enum
+from functools import partial
 import logging
 from pathlib import Path
-from typing import Optional
+import re
+import shlex
+import threading
+from typing import Callable, ClassVar, Dict, Iterable, Iterator, Optional, Tuple
 from typing import List, Mapping, Sequence
 
-import docker
-import docker.api.build
-import docker.errors
-from packaging.requirements import Requirement
-from packaging.version import Version
-from pep517 import meta
-
 from pydep.deps import Dependency
 from pydep.depsmgr import DepsManager
-from pydep.vercache import VersionsCache
-from pydep.versions import VersionMapping, VersionRange
+from pydep.metrics import metrics
+from pydep.versions import Version, VersionMapping, VersionRange
 
-# taken from here: https://github.com/docker/docker-py/issues/2105#issuecomment-613685891
-docker.api.build.process_dockerfile = lambda dockerfile, _: ("Dockerfile", dockerfile)  # type: ignore
 logger = logging.getLogger(__name__)
 
 
+def __getattr__(name: str):
+    # `DockerPyRunner` pulls in docker, httpx and pep517, so it lives in its
+    # own module and is only imported when somebody asks for it.
+    if name == "DockerPyRunner":
+        from pydep.dockerpy import DockerPyRunner
+
+        return DockerPyRunner
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class Test:
     """Abstract base class for Tests"""
 
@@ -29,17 +40,105 @@ class Test:
         raise NotImplementedError
 
 
+class ClauseIndex:
+    """
+    Index over the clauses of a `VirtualTest`, as bitsets with a bit per
+    clause. The boundaries of the ranges of each dependency split its
+    versions in segments, each with the bitset of the clauses admitting it;
+    clauses not constraining a dependency admit all of its versions. The
+    clauses holding for a mapping are then the AND, over the dependencies, of
+    the bitset of the segment of each version, looked up by its rank.
+    """
+
+    def __init__(self, true_when: Sequence[Mapping[Dependency, VersionRange]]):
+        self.all = (1 << len(true_when)) - 1
+
+        # dependency -> its clauses' ranges, as (bit, range)
+        ranges: Dict[Dependency, List[Tuple[int, VersionRange]]] = {}
+        for i, conditions in enumerate(true_when):
+            for dep, rng in conditions.items():
+                ranges.setdefault(dep, []).append((1 << i, rng))
+
+        # (dependency, its `ranks`, boundaries, bitset of each segment, segment
+        # of each rank); segment 2i is right before boundary i and 2i + 1 is on
+        # it.
+        # The dependencies constrained by more clauses go first, as they are
+        # likelier to rule out every clause.
+        self.deps: List[Tuple[Dependency, dict, list, List[int], array]] = []
+        for dep, dranges in sorted(ranges.items(), key=lambda it: -len(it[1])):
+            free = self.all
+            starts: Dict[Version, int] = {}
+            ends: Dict[Version, int] = {}
+
+            for bit, rng in dranges:
+                free &= ~bit
+                starts[rng.min] = starts.get(rng.min, 0) | bit
+                ends[rng.max] = ends.get(rng.max, 0) | bit
+
+            points = sorted(set(starts) | set(ends))
+            masks = []
+            active = 0
+
+            for point in points:
+                masks.append(active | free)
+                active |= starts.get(point, 0)
+                masks.append(active | free)
+                active &= ~ends.get(point, 0)
+
+            masks.append(free)
+
+            segments = array("I", map(partial(self._segment, points), dep.versions))
+            self.deps.append((dep, dep.ranks, points, masks, segments))
+
+    @staticmethod
+    def _segment(points: list, ver: Version) -> int:
+        i = bisect.bisect_left(points, ver)
+        return 2 * i + (i < len(points) and points[i] == ver)
+
+    def matches(self, pinned_vers: VersionMapping) -> int:
+        """Bitset of the clauses holding for `pinned_vers`."""
+
+        mask = self.all
+        for dep, ranks, points, masks, segments in self.deps:
+            ver = pinned_vers[dep]
+            rank = ranks.get(id(ver))
+
+            if rank is None:
+                mask &= masks[self._segment(points, ver)]
+            else:
+                mask &= masks[segments[rank]]
+
+            if not mask:
+                break
+
+        return mask
+
+
 @dataclass
 class VirtualTest(Test):
     """
     A virtual test:
         `true_when` holds 'conditions' that tell whether to return True or False for
         this virtual test.
+
+    Tests with at least `INDEX_MIN_CLAUSES` clauses compile a `ClauseIndex` on
+    their first run; `true_when` mustn't change after that.
     """
 
+    INDEX_MIN_CLAUSES: ClassVar[int] = 16
+
     true_when: Sequence[Mapping[Dependency, VersionRange]]
+    _index: Optional[ClauseIndex] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def run(self, pinned_vers: VersionMapping) -> bool:
+        if len(self.true_when) >= self.INDEX_MIN_CLAUSES:
+            if self._index is None:
+                self._index = ClauseIndex(self.true_when)
+
+            return self._index.matches(pinned_vers) != 0
+
         for conditions in self.true_when:
             for dep, range in conditions.items():
                 cur_ver = pinned_vers[dep]
@@ -66,14 +165,110 @@ class PytestCmd(TestCmd):
         if self.cmd is None:
             self.cmd = "pytest"
 
-    def run(self):
-        return self.cmd
+    def run(self, paths: Optional[Sequence[str]] = None):
+        """The command to run, only for the test files `paths` if given."""
+
+        if paths is None:
+            return self.cmd
+
+        return " ".join([self.cmd] + [shlex.quote(path) for path in paths])  # type: ignore
+
+
+# output lines telling that a test run has already failed: import errors of
+# test modules or conftest.py files, for pytest and unittest
+DEFAULT_FAIL_PATTERNS = (
+    r"^ImportError while (importing test module|loading conftest)",
+    r"^ERROR collecting ",
+    r"^E\s+(ModuleNotFoundError|ImportError):",
+    r"^ImportError: Failed to import test module",
+)
+
+
+class EarlyStop:
+    """
+    When to give up on a test command before it finishes: as soon as a line
+    of its output matches one of the regular expressions `patterns`, or after
+    `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        patterns: Sequence[str] = DEFAULT_FAIL_PATTERNS,
+        timeout: Optional[float] = None,
+        tail: int = 50,
+    ) -> None:
+        self.patterns = list(patterns)
+        self.regex = None
+        if self.patterns:
+            self.regex = re.compile("|".join(f"(?:{p})" for p in self.patterns))
+
+        self.timeout = timeout
+        self.tail = tail
+
+    def watch(self, chunks: Iterable[bytes]) -> Tuple[Optional[str], str]:
+        """
+        Reads the output `chunks` of a command until it ends or a line
+        matches, returns the matching line, if any, and the last lines read.
+        """
+
+        lines: deque = deque(maxlen=self.tail)
+        pending = ""
+
+        for chunk in chunks:
+            pending += chunk.decode(errors="replace")
+            *complete, pending = pending.split("\n")
+
+            for line in complete:
+                lines.append(line)
+
+                if self.regex is not None and self.regex.search(line):
+                    return line, "\n".join(lines)
+
+        if pending:
+            lines.append(pending)
+
+            if self.regex is not None and self.regex.search(pending):
+                return pending, "\n".join(lines)
+
+        return None, "\n".join(lines)
+
+    @contextmanager
+    def deadline(self, kill: Callable[[], None]) -> Iterator[threading.Event]:
+        """
+        Calls `kill` if the block is still running after `timeout` seconds,
+        yields an event telling whether it did.
+        """
+
+        expired = threading.Event()
+
+        if self.timeout is None:
+            yield expired
+            return
+
+        def expire():
+            expired.set()
+            kill()
+
+        timer = threading.Timer(self.timeout, expire)
+        timer.daemon = True
+        timer.start()
+
+        try:
+            yield expired
+        finally:
+            timer.cancel()
 
 
 class TestCmdsEnum(str, enum.Enum):
     pytest = "PytestCmd"
 
 
+class ExternalRunnersEnum(str, enum.Enum):
+    image = "image"
+    container = "container"
+    venv = "venv"
+
+
 class TestRunner:
     def __init__(self, tests: Sequence[Test]) -> None:
         self.tests = tests
@@ -81,12 +276,38 @@ class TestRunner:
     def run_all(self, pinned_vers: VersionMapping) -> List[bool]:
         raise NotImplementedError
 
+    def run_batch(self, mappings: Sequence[VersionMapping]) -> List[List[bool]]:
+        """
+        `run_all` of each mapping in `mappings`, runners able to evaluate
+        them concurrently override it.
+        """
+
+        return [self.run_all(pinned_vers) for pinned_vers in mappings]
+
 
 class LinearRunner(TestRunner):
     def run_all(self, pinned_vers: VersionMapping) -> List[bool]:
+        metrics.incr("evaluations")
         return [test.run(pinned_vers) for test in self.tests]
 
 
+class CountingRunner(TestRunner):
+    """Wraps another runner counting the evaluations made through it."""
+
+    def __init__(self, runner: TestRunner) -> None:
+        super().__init__(runner.tests)
+        self.runner = runner
+        self.evaluations = 0
+
+    def run_all(self, pinned_vers: VersionMapping) -> List[bool]:
+        self.evaluations += 1
+        return self.runner.run_all(pinned_vers)
+
+    def run_batch(self, mappings: Sequence[VersionMapping]) -> List[List[bool]]:
+        self.evaluations += len(mappings)
+        return self.runner.run_batch(mappings)
+
+
 class ExternalRunner(TestRunner):
     def __init__(
         self, project: Path, depsmgr: DepsManager, tests: Sequence[Test]
@@ -94,146 +315,93 @@ class ExternalRunner(TestRunner):
         super().__init__(tests)
         self.project = project
         self.depsmgr = depsmgr
+        # candidates of a batch evaluated at the same time
+        self.workers = 1
+        self.early_stop = EarlyStop()
+        # a `pydep.affected.TestSelector`, to run only the affected tests
+        self.selector = None
+        # a `pydep.resolver.Resolver`, to pin the transitive dependencies
+        self.resolver = None
+        # python version of the test environment, set by `init_deps_mapping`
+        self.pyver: Optional[str] = None
 
     def init_deps_mapping(self) -> VersionMapping:
         raise NotImplementedError
 
+    def probe(self, code: str) -> str:
+        """Output of running the python code `code` in the test environment."""
 
-class DockerPyRunner(ExternalRunner):
-    def __init__(
-        self,
-        project: Path,
-        depsmgr: DepsManager,
-        tests: Sequence[TestCmd],
-        img_basename: str,
-        pytag: str,
-    ) -> None:
-        super().__init__(project, depsmgr, tests)
-
-        self.img = f"python:{pytag}"
-        self.img_basename = img_basename
-        self.workdir = "/home/pydep/app"
-
-    def _base_dockerfile(self) -> List[str]:
-        return [
-            f"FROM {self.img}",
-            "RUN groupadd pydep && useradd -mg pydep pydep",
-            "USER pydep",
-            "ENV VIRTUAL_ENV=/home/pydep/.venv",
-            "RUN python -m venv $VIRTUAL_ENV",
-            "ENV PATH=$VIRTUAL_ENV/bin:$PATH",
-            "RUN pip config set global.disable-pip-version-check true",
-            f"COPY --chown=pydep:pydep . {self.workdir}/",
-            f"WORKDIR {self.workdir}",
-            f"ENV PYTHONPATH={self.workdir}",
-        ]
-
-    def init_deps_mapping(
-        self, top_level=True, cache_min_year: int = 2018
-    ) -> VersionMapping:
-        logger.info("Initializing base dockerfile")
-
-        dockerfile = self._base_dockerfile()
-
-        dockerfile.append("RUN " + self.depsmgr.cmd_init_pinned_deps())
-        dockerfile.append("CMD pip freeze")
-        dfstr = "\n".join(dockerfile)
-        logger.debug(dfstr)
-
-        dockerclient = docker.from_env()
-        img, _ = dockerclient.images.build(
-            path=str(self.project),
-            dockerfile=dfstr,
-            rm=True,
-            tag=f"pydep/{self.img_basename}",
-        )  # type: ignore
-
-        output = dockerclient.containers.run(img.id, remove=True).decode()  # type: ignore
-
-        deps = []
-        vers = []
-        for line in output.split("\n"):
-            if "==" not in line:
-                continue
-
-            name, ver = line.split("==", maxsplit=1)
-            deps.append(name)
-            vers.append(ver)
-
-        pyver = (
-            dockerclient.containers.run(
-                img.id, remove=True, command="/bin/sh -c 'echo $PYTHON_VERSION'"
-            )
-            .decode()
-            .rstrip()
-        )  # type: ignore
-
-        logger.info(f"Container is running on Python {pyver}")
-
-        versions_cache = VersionsCache(Version(pyver), loyear=cache_min_year)
-        versions = versions_cache.fetch_versions(deps)
-        mapping = {}
-
-        dist = meta.load(self.project)
-
-        reqs = {}
-        for line in dist.requires or []:
-            req = Requirement(line)
-            req.name = req.name.lower().replace("-", "_")
-            reqs[req.name] = req
+        raise NotImplementedError
 
-        for name, ver in zip(deps, vers):
-            dep = Dependency(name, versions[name], Requirement(f"{name}=={ver}"))
+    def install_mapping(self, pinned_vers: VersionMapping) -> Optional[VersionMapping]:
+        """
+        The versions to install for `pinned_vers`: them and, if resolving
+        them, the pins of their transitive dependencies; None if those
+        conflict, so the candidate can't be installed.
+        """
 
-            if top_level:
-                norm_name = name.lower().replace("-", "_")
+        if self.resolver is None:
+            return pinned_vers
 
-                if norm_name in reqs:
-                    dep = Dependency(name, versions[name], reqs[norm_name])
+        from pydep.resolver import ResolutionConflict
 
-                else:
-                    continue
+        try:
+            return {**self.resolver.resolve(pinned_vers), **pinned_vers}
+        except ResolutionConflict as err:
+            logger.warning("Not installable: %s", err)
+            return None
+
+    def test_cmds(self, pinned_vers: VersionMapping) -> List[Optional[str]]:
+        """
+        The command of each test for `pinned_vers`, None for the tests that
+        can be skipped because nothing they import changed. Runners ask for
+        them only once `pinned_vers` installed successfully, so a skipped
+        test passes as it did in the mapping the candidate is close to.
+        """
+
+        paths = None
+        if self.selector is not None:
+            paths = self.selector.select(pinned_vers)
+
+        if paths is None:
+            return [test.run() for test in self.tests]  # type: ignore
+
+        if paths:
+            metrics.incr("affected.selected")
+            return [test.run(paths) for test in self.tests]  # type: ignore
+
+        metrics.incr("affected.skipped")
+        return [None] * len(self.tests)
+
+    def stopped(self, cmd: str, matched: Optional[str], expired: bool) -> bool:
+        """Logs why `cmd` was stopped early, if it was; whether it was."""
+
+        if expired:
+            metrics.incr("tests.timeouts")
+            logger.warning(
+                "%s timed out after %ss",
+                cmd,
+                self.early_stop.timeout,
+                extra={"cmd": cmd},
+            )
 
-            mapping[dep] = Version(ver)
+        elif matched is not None:
+            metrics.incr("tests.early_stops")
+            logger.warning("%s stopped on: %s", cmd, matched, extra={"cmd": cmd})
 
-        return mapping
+        return expired or matched is not None
 
-    def run_all(self, pinned_vers: VersionMapping) -> List[bool]:
-        logger.info("Running tests")
+    def record(self, pinned_vers: VersionMapping, results: Sequence[bool]):
+        if self.selector is not None:
+            self.selector.record(pinned_vers, results)
 
-        dockerfile = self._base_dockerfile()
-        dockerfile.append("RUN " + self.depsmgr.cmd_install_deps(pinned_vers))
-        dfstr = "\n".join(dockerfile)
-        logger.debug(dfstr)
+    def run_batch(self, mappings: Sequence[VersionMapping]) -> List[List[bool]]:
+        if self.workers <= 1 or len(mappings) <= 1:
+            return super().run_batch(mappings)
 
-        dockerclient = docker.from_env()
+        workers = min(self.workers, len(mappings))
+        with ThreadPoolExecutor(workers, thread_name_prefix="pydep-run") as executor:
+            return list(executor.map(self.run_all, mappings))
 
-        try:
-            img, _ = dockerclient.images.build(
-                path=str(self.project),
-                dockerfile=dfstr,
-                rm=True,
-                tag=f"pydep/{self.img_basename}-runner",
-            )  # type: ignore
-        except docker.errors.BuildError as err:
-            for line in err.build_log:
-                if "stream" in line:  # temporal maybe?
-                    logger.error(line["stream"])
-
-            return [False] * len(self.tests)
-
-        res = []
-        for test in self.tests:
-            cmd = test.run()  # type: ignore
-            logger.debug(f"Running {cmd}")
-            success = True
-
-            try:
-                dockerclient.containers.run(img.id, remove=True, command=cmd)
-            except Exception as err:
-                logger.warning(err)
-                success = False
-
-            res.append(success)
-
-        return res
+    def close(self):
+        """Releases whatever the runner keeps around between evaluations."""
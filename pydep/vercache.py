@@ -3,16 +3,16 @@ from datetime import datetime
 import json
 import logging
 from pathlib import Path
-from typing import Dict, List, Sequence
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from appdirs import user_cache_dir
-import docker
-import docker.api.build
-import docker.errors
 import httpx
+from packaging.utils import canonicalize_name
 from packaging.version import Version
 
-docker.api.build.process_dockerfile = lambda dockerfile, _: ("Dockerfile", dockerfile)  # type: ignore
+from pydep.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,6 +25,13 @@ class VersionsCache:
         if not self.dir.exists():
             self.dir.mkdir(parents=True)
 
+        # the requirements of a release don't depend on the python running it,
+        # so they are shared by every python version: dep -> version -> them
+        self.requires_dir = self.dir.parent / "requires"
+        self.requires_dir.mkdir(exist_ok=True)
+        self._requires: Dict[str, Dict[str, List[str]]] = {}
+        self._requires_lock = threading.Lock()
+
     def cached_deps(self) -> List[str]:
         return [d.stem for d in self.dir.iterdir()]
 
@@ -47,12 +54,16 @@ class VersionsCache:
 
     async def __make_versions_request(self, dep: str, check_cache: bool) -> List[str]:
         if check_cache and self.has(dep):
+            metrics.incr("vercache.hits")
             return self.loads(dep)
 
-        async with httpx.AsyncClient(
-            base_url="https://pypi.org", follow_redirects=True
-        ) as client:
-            r = await client.get(f"/pypi/{dep}/json")
+        metrics.incr("vercache.misses")
+
+        with metrics.timer("vercache.request"):
+            async with httpx.AsyncClient(
+                base_url="https://pypi.org", follow_redirects=True
+            ) as client:
+                r = await client.get(f"/pypi/{dep}/json")
 
         releases = r.json()["releases"]
 
@@ -74,13 +85,14 @@ class VersionsCache:
     ) -> Dict[str, List[Version]]:
         logger.info("Fetching versions of installed dependencies...")
 
-        tasks = [
-            asyncio.ensure_future(self.__make_versions_request(dep, check_cache))
-            for dep in deps
-        ]
+        async def gather():
+            return await asyncio.gather(
+                *(self.__make_versions_request(dep, check_cache) for dep in deps)
+            )
 
-        loop = asyncio.get_event_loop()
-        resp = loop.run_until_complete(asyncio.gather(*tasks))
+        # a loop of its own, so it works from any thread and after other runs
+        with metrics.timer("vercache.fetch"):
+            resp = asyncio.run(gather())
 
         versions = {}
         for dep, res in zip(deps, resp):
@@ -88,6 +100,75 @@ class VersionsCache:
 
         return versions
 
+    def _load_requires(self, dep: str) -> Dict[str, List[str]]:
+        if dep not in self._requires:
+            path = self.requires_dir / f"{dep}.json"
+            self._requires[dep] = json.loads(path.read_text()) if path.exists() else {}
+
+        return self._requires[dep]
+
+    async def __make_requires_request(
+        self, client: httpx.AsyncClient, dep: str, ver: str
+    ) -> Optional[List[str]]:
+        metrics.incr("vercache.requires_misses")
+
+        with metrics.timer("vercache.request"):
+            r = await client.get(f"/pypi/{dep}/{ver}/json")
+
+        if r.status_code == 404:
+            logger.debug("No metadata for %s==%s", dep, ver)
+            return None
+
+        r.raise_for_status()
+        return r.json()["info"].get("requires_dist") or []
+
+    async def __make_requires_requests(
+        self, releases: Sequence[Tuple[str, str]]
+    ) -> List[Optional[List[str]]]:
+        async with httpx.AsyncClient(
+            base_url="https://pypi.org", follow_redirects=True
+        ) as client:
+            return await asyncio.gather(
+                *(self.__make_requires_request(client, *rel) for rel in releases)
+            )
+
+    def fetch_requires(
+        self, releases: Sequence[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], List[str]]:
+        """
+        The `Requires-Dist` of each (dependency, version) of `releases`, from
+        the cache or else from PyPI, which then get cached; releases PyPI
+        doesn't know of require nothing, and aren't cached. Dependencies are
+        keyed by their canonical name. Safe to call from several threads.
+        """
+
+        releases = [(canonicalize_name(dep), ver) for dep, ver in releases]
+
+        with self._requires_lock:
+            missing = sorted(
+                {rel for rel in releases if rel[1] not in self._load_requires(rel[0])}
+            )
+            metrics.incr("vercache.requires_hits", len(releases) - len(missing))
+
+            if missing:
+                with metrics.timer("vercache.fetch"):
+                    resp = asyncio.run(self.__make_requires_requests(missing))
+
+                fetched = {
+                    rel: reqs for rel, reqs in zip(missing, resp) if reqs is not None
+                }
+
+                for (dep, ver), reqs in fetched.items():
+                    self._requires[dep][ver] = reqs
+
+                for dep in {dep for dep, _ in fetched}:
+                    path = self.requires_dir / f"{dep}.json"
+                    path.write_text(json.dumps(self._requires[dep]))
+
+            return {
+                (dep, ver): self._requires[dep].get(ver, []) for dep, ver in releases
+            }
+
 
 if __name__ == "__main__":
     versions_cache = VersionsCache(Version("3.9.7"))
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from pathlib import Path
 from packaging.version import Version
 from typing import Dict
 from pydep.deps import Dependency
@@ -18,3 +19,41 @@ class VersionRange:
     def __post_init__(self):
         if self.min > self.max:
             raise VersionRangeException("Not a valid version range")
+
+
+def parse_freeze(freeze: str) -> Dict[str, str]:
+    """The `name==version` lines of the `pip freeze` output `freeze`."""
+
+    pins = {}
+    for line in freeze.split("\n"):
+        if "==" not in line:
+            continue
+
+        name, ver = line.split("==", maxsplit=1)
+        pins[name] = ver.strip()
+
+    return pins
+
+
+def read_pins(path: Path, mapping: VersionMapping) -> VersionMapping:
+    """
+    The `name==version` pins of the requirements file `path`, for the
+    dependencies in `mapping`; those not pinned keep their version there.
+    """
+
+    by_name = {dep.name.lower().replace("-", "_"): dep for dep in mapping}
+    pins = dict(mapping)
+
+    for line in path.read_text().splitlines():
+        line = line.split("#", maxsplit=1)[0]
+
+        if "==" not in line:
+            continue
+
+        name, ver = line.split("==", maxsplit=1)
+        dep = by_name.get(name.strip().lower().replace("-", "_"))
+
+        if dep is not None:
+            pins[dep] = Version(ver.strip())
+
+    return pins
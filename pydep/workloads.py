@@ -0,0 +1,264 @@
+"""
+Synthetic virtual testcases for stress testing the algorithms.
+
+Unlike `stats/stats.py::generate` these scale to hundreds of dependencies and
+thousands of clauses: version counts follow a power law, the ranges of a
+clause are correlated between dependencies (all around the same "era" of
+releases) and satisfiability can be forced either way. Testcases are written
+as TOML while they are generated, without building the whole config first.
+"""
+
+from dataclasses import dataclass, replace
+import json
+from pathlib import Path
+import random
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+@dataclass(frozen=True)
+class WorkloadParams:
+    deps: int = 20
+    # version counts follow a Pareto distribution with shape `alpha`
+    min_versions: int = 4
+    max_versions: int = 200
+    alpha: float = 1.5
+    tests: int = 1
+    clauses: int = 10
+    # fraction of the dependencies mentioned by each clause
+    density: float = 0.3
+    # fraction of the versions of a dependency covered by a range, on average
+    width: float = 0.4
+    # 0 means ranges of a clause are independent, 1 that they share their era
+    correlation: float = 0.7
+    # probability of a dependency having a lower bound specifier
+    specifier_prob: float = 0.2
+    # True plants a solution, False makes the testcase unsatisfiable and
+    # None leaves it to chance
+    satisfiable: Optional[bool] = True
+    seed: int = 0
+
+
+class Workload:
+    """A testcase generated from `WorkloadParams`, the same params always give the same testcase."""
+
+    def __init__(self, params: WorkloadParams) -> None:
+        self.params = params
+        self.rng = random.Random(f"workload:{params.seed}")
+        self.names: List[str] = []
+        self.versions: List[List[str]] = []
+        self.specifiers: List[str] = []
+        self.inivers: List[str] = []
+        # planted solution, as ranks in `versions`
+        self.hidden: List[int] = []
+        # dependency and rank from where on versions are excluded by its
+        # specifier, in unsatisfiable testcases
+        self.blocked: Optional[Tuple[int, int]] = None
+
+        self._make_dependencies()
+
+    def _version_count(self) -> int:
+        p = self.params
+        n = int(p.min_versions * self.rng.paretovariate(p.alpha))
+        return max(p.min_versions, min(n, p.max_versions))
+
+    def _make_versions(self, n: int) -> List[str]:
+        rng = self.rng
+        major, minor, patch = rng.randint(0, 3), rng.randint(0, 9), 0
+
+        vers = []
+        for _ in range(n):
+            vers.append(f"{major}.{minor}.{patch}")
+            step = rng.random()
+
+            if step < 0.6:
+                patch += 1
+            elif step < 0.9:
+                minor, patch = minor + 1, 0
+            else:
+                major, minor, patch = major + 1, 0, 0
+
+        return vers
+
+    def _make_dependencies(self):
+        p, rng = self.params, self.rng
+        era = rng.random()
+
+        for i in range(p.deps):
+            vers = self._make_versions(self._version_count())
+            n = len(vers)
+            hidden = self._around(era, n, rng)
+
+            # initial versions always conform to the specifier
+            lo = 0
+            specifier = ""
+            if rng.random() < p.specifier_prob:
+                lo = rng.randint(0, hidden)
+                specifier = f">={vers[lo]}"
+
+            self.names.append(f"pkg{i:05d}")
+            self.versions.append(vers)
+            self.hidden.append(hidden)
+            self.specifiers.append(specifier)
+            self.inivers.append(vers[rng.randint(lo, n - 1)])
+
+        if p.satisfiable is False:
+            dep = max(range(p.deps), key=lambda i: len(self.versions[i]))
+            vers = self.versions[dep]
+
+            if len(vers) < 2:
+                raise ValueError(
+                    "unsatisfiable testcases need 2 versions of a dependency"
+                )
+
+            # every clause requires versions the specifier excludes
+            rank = len(vers) // 2
+            self.blocked = (dep, rank)
+            self.specifiers[dep] = f"<{vers[rank]}"
+            self.inivers[dep] = vers[rng.randrange(rank)]
+
+    def _around(self, era: float, n: int, rng: random.Random) -> int:
+        c = self.params.correlation
+        center = c * era + (1 - c) * rng.random()
+        return min(n - 1, int(center * n))
+
+    def _clause(self, rng: random.Random, planted: bool) -> Dict[str, Tuple[str, str]]:
+        p = self.params
+        era = rng.random()
+
+        clause = {}
+        for i, vers in enumerate(self.versions):
+            blocked = self.blocked is not None and self.blocked[0] == i
+
+            if rng.random() >= p.density and not blocked:
+                continue
+
+            n = len(vers)
+            mid = self._around(era, n, rng)
+            half = max(0, int(p.width * n * rng.uniform(0.25, 0.75)))
+            lo, hi = max(0, mid - half), min(n - 1, mid + half)
+
+            if planted:
+                lo, hi = min(lo, self.hidden[i]), max(hi, self.hidden[i])
+
+            if blocked:
+                lo, hi = max(lo, self.blocked[1]), max(hi, self.blocked[1])  # type: ignore
+
+            clause[self.names[i]] = (vers[lo], vers[hi])
+
+        return clause
+
+    def iter_tests(self) -> Iterator[Iterator[Dict[str, Tuple[str, str]]]]:
+        """
+        Yields each test as an iterator over its clauses, which are generated
+        while iterating. Every call yields the same tests.
+        """
+
+        p = self.params
+        rng = random.Random(f"workload:{p.seed}:tests")
+
+        for _ in range(p.tests):
+            planted = rng.randrange(p.clauses) if p.satisfiable else -1
+            yield (self._clause(rng, k == planted) for k in range(p.clauses))
+
+    def write_toml(self, fd: TextIO, tests_file: Optional[str] = None):
+        """
+        Writes the testcase as TOML, its tests apart in the JSON lines file
+        `tests_file` (see `write_jsonl_tests`) if given.
+        """
+
+        if tests_file is not None:
+            fd.write(f"tests_file = {json.dumps(tests_file)}\n\n")
+
+        fd.write("[dependencies]\n")
+
+        for name, vers, spec, ini in zip(
+            self.names, self.versions, self.specifiers, self.inivers
+        ):
+            fd.write(f"\n[dependencies.{name}]\n")
+            fd.write(f"versions = {json.dumps(vers)}\n")
+            fd.write(f"specifier = {json.dumps(spec)}\n")
+            fd.write(f"iniver = {json.dumps(ini)}\n")
+
+        if tests_file is not None:
+            return
+
+        for test in self.iter_tests():
+            fd.write("\n[[tests]]\n")
+
+            for clause in test:
+                fd.write("\n[[tests.true_when]]\n")
+
+                for name, (lo, hi) in clause.items():
+                    fd.write(f"{name} = {json.dumps([lo, hi])}\n")
+
+    def write_jsonl_tests(self, fd: TextIO):
+        """Writes a JSON line per test."""
+
+        for test in self.iter_tests():
+            clauses = [{k: list(v) for k, v in c.items()} for c in test]
+            fd.write(json.dumps({"true_when": clauses}) + "\n")
+
+    def to_dict(self) -> dict:
+        deps = {}
+        for name, vers, spec, ini in zip(
+            self.names, self.versions, self.specifiers, self.inivers
+        ):
+            deps[name] = {"versions": vers, "specifier": spec, "iniver": ini}
+
+        tests = []
+        for test in self.iter_tests():
+            tests.append(
+                {"true_when": [{k: list(v) for k, v in c.items()} for c in test]}
+            )
+
+        return {"dependencies": deps, "tests": tests}
+
+
+# suites of increasing scale, each with a fixed number of seeded testcases
+SUITES: Dict[str, Tuple[int, WorkloadParams]] = {
+    "small": (20, WorkloadParams(deps=10, tests=2, clauses=10, density=0.4)),
+    "medium": (20, WorkloadParams(deps=50, tests=3, clauses=50, density=0.15)),
+    "large": (
+        10,
+        WorkloadParams(deps=200, max_versions=500, tests=5, clauses=200, density=0.05),
+    ),
+    "huge": (
+        5,
+        WorkloadParams(
+            deps=500, max_versions=1000, tests=10, clauses=1000, density=0.02
+        ),
+    ),
+}
+
+
+def suite(name: str) -> Iterator[Tuple[str, Workload]]:
+    """Yields the named testcases of suite `name`, every fifth one is unsatisfiable."""
+
+    count, params = SUITES[name]
+
+    for i in range(count):
+        satisfiable = i % 5 != 4
+        yield f"{name}-{i:03d}", Workload(
+            replace(params, seed=i, satisfiable=satisfiable)
+        )
+
+
+def write_suite(name: str, outdir: Path, jsonl_tests: bool = False):
+    """
+    Writes the testcases of suite `name` as TOML files in `outdir`, with
+    `jsonl_tests` their tests apart in a JSON lines file each.
+    """
+
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    for case, workload in suite(name):
+        tests_file = None
+
+        if jsonl_tests:
+            tests_file = f"{case}.tests.jsonl"
+
+            with (outdir / tests_file).open("w") as fd:
+                workload.write_jsonl_tests(fd)
+
+        with (outdir / f"{case}.toml").open("w") as fd:
+            workload.write_toml(fd, tests_file)
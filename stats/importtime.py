@@ -0,0 +1,108 @@
+"""
+Import time regression benchmark for the CLI.
+
+Checks that importing the CLI doesn't pull the docker/http stack and measures
+how long `pydep virtual` takes to start and solve a small testcase.
+"""
+
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+import typer
+
+ROOT = Path(__file__).resolve().parent.parent
+TESTCASE = ROOT / "inputs" / "a.toml"
+
+# modules that must not be imported just to build the CLI or run `virtual`
+HEAVY = ["docker", "httpx", "pep517", "appdirs", "pydep.dockerpy", "pydep.vercache"]
+
+CLI = "from pydep.__main__ import app; app()"
+
+
+def loaded_heavy_modules() -> List[str]:
+    code = (
+        "import sys, json\n"
+        "import pydep.__main__\n"
+        f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, cwd=ROOT
+    )
+    return json.loads(out.stdout)
+
+
+def cli_import_time() -> float:
+    """Cumulative import time of `pydep.__main__` in seconds, from -X importtime"""
+
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import pydep.__main__"],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+
+    # lines look like `import time:   self [us] | cumulative | imported package`
+    for line in out.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+
+        if name.strip() == "pydep.__main__":
+            return int(cumulative) / 1e6
+
+    raise RuntimeError("pydep.__main__ not found in -X importtime output")
+
+
+def virtual_wall_time(runs: int) -> List[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", CLI, "virtual", str(TESTCASE)],
+            check=True,
+            capture_output=True,
+            cwd=ROOT,
+        )
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def main(
+    runs: int = typer.Option(10, help="Times to run `pydep virtual`"),
+    max_import: float = typer.Option(
+        0.25, help="Maximum allowed import time of the CLI in seconds"
+    ),
+):
+    heavy = loaded_heavy_modules()
+    imptime = cli_import_time()
+    times = virtual_wall_time(runs)
+
+    typer.echo(f"import pydep.__main__: {imptime * 1000:.1f} ms")
+    typer.echo(
+        f"pydep virtual: median {statistics.median(times) * 1000:.1f} ms, "
+        f"min {min(times) * 1000:.1f} ms over {runs} runs"
+    )
+
+    failed = False
+    if heavy:
+        typer.secho(f"Heavy modules imported by the CLI: {heavy}", fg=typer.colors.RED)
+        failed = True
+
+    if imptime > max_import:
+        typer.secho(
+            f"Import time above the allowed {max_import * 1000:.1f} ms",
+            fg=typer.colors.RED,
+        )
+        failed = True
+
+    if failed:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
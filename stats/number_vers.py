@@ -1,4 +1,4 @@
-from pydep.tests import DockerPyRunner
+from pydep.dockerpy import DockerPyRunner
 from pydep.depsmgr import Pip
 from typing import List
 from pathlib import Path
@@ -1,4 +1,7 @@
+import json
 import logging
+import os
+from pathlib import Path
 import random
 from typing import List
 
@@ -9,10 +12,7 @@ from pylatex.labelref import Label
 from pylatex.table import Table, Tabular
 
 from pydep import algorithms
-from pydep import costs
-from pydep import opts
-from pydep.parser import parse_virtual_config
-from pydep.tests import LinearRunner
+from pydep import bench
 
 ITS = [15, 40, 80, 150, 500, 700, 1000, 3000, 5000]
 
@@ -22,7 +22,8 @@ handler.setFormatter(
     logging.Formatter(fmt="{levelname} ({module}:{lineno}): {message}", style="{")
 )
 logger.addHandler(handler)
-logger.setLevel(logging.DEBUG)
+# set STATS_LOG_LEVEL=DEBUG to also log every generated testcase
+logger.setLevel(os.environ.get("STATS_LOG_LEVEL", "INFO"))
 
 
 def freeze_randoms():
@@ -69,67 +70,37 @@ def generate(deps: int, t: int) -> dict:
     return ans
 
 
-def prepare_algo(algo_cls, testcase, iterations):
-    ldeps, tests, inivers = parse_virtual_config(testcase)
-
-    mapping = {}
-    for dep, ver in zip(ldeps, inivers):
-        mapping[dep] = ver
-
-    solver = algo_cls(
-        ldeps,
-        LinearRunner(tests),
-        costs.Sum(costs.version_to_float),
-        opts.Max(),
-        inimapping=mapping,
-        iterations=iterations,
-    )
-
-    return solver
-
-
-def run(total: int, deps: int, t: int):
+def run(total: int, deps: int, t: int, seeds: int = 1, workers=None):
     tsets = [generate(random.randint(2, deps), t) for _ in range(total)]
 
-    import json
+    if logger.isEnabledFor(logging.DEBUG):
+        for te in tsets:
+            logger.debug(json.dumps(te, indent=4))
 
-    for te in tsets:
-        logger.debug(json.dumps(te, indent=4))
+    names = [name.value for name in algorithms.AlgorithmsAvailable]
+    results = list(bench.run_benchmark(tsets, names, ITS, seeds, workers))
 
-    res = {}
+    bench.write_csv(results, Path("stats.csv"))
+    bench.write_json(results, Path("stats.json"))
 
-    for name in algorithms.AlgorithmsAvailable:
-        algo = getattr(algorithms, name.value)
-        res[algo.desc_name] = {}
-
-        for it in ITS:
-            successes = 0
-            ssum = 0
-
-            for tset in tsets:
-                solver = prepare_algo(algo, tset, it)
-
-                try:
-                    resp = solver.run()
-                    ssum += resp[0]
-                except opts.NotSolutionException:
-                    continue
-
-                successes += 1
-
-            res[algo.desc_name][it] = {
-                "succ_sum": ssum,
-                "successes": successes,
-                "total": len(tsets),
-            }
+    res = {}
+    for name, per_budget in bench.summarize(results).items():
+        algo = getattr(algorithms, name)
+        res[algo.desc_name] = per_budget
 
-            if not successes:
+        for it, d in per_budget.items():
+            if not d["successes"]:
                 continue
 
-            avg = ssum / successes
+            avg = d["succ_sum"] / d["successes"]
 
-            logger.debug(
-                f"algo = {name.value}, it = {it}, avg_succ = {avg:.3e}, successes = {successes}, total = {len(tsets)}"
+            logger.info(
+                "algo = %s, it = %d, avg_succ = %.3e, successes = %d, total = %d",
+                name,
+                it,
+                avg,
+                d["successes"],
+                d["total"],
             )
 
     return res
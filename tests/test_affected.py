@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from packaging.requirements import Requirement
+from packaging.version import Version
+
+from pydep import affected
+from pydep.deps import Dependency
+
+
+class Index:
+    """Each test imports the dependency it is named after."""
+
+    def tests_for(self, changed):
+        return [f"test_{name}.py" for name in sorted(changed)]
+
+
+DEPS = [
+    Dependency(name, [Version("1"), Version("2")], Requirement(name))
+    for name in "abcde"
+]
+
+
+def mapping(*newer: str):
+    return {dep: Version("2" if dep.name in newer else "1") for dep in DEPS}
+
+
+def test_runs_everything_without_a_passing_mapping():
+    selector = affected.TestSelector(Index())  # type: ignore
+
+    assert selector.select(mapping("a")) is None
+
+    selector.record(mapping(), [True, False])
+    assert selector.select(mapping("a")) is None
+
+
+def test_runs_the_tests_of_the_closest_passing_mapping():
+    selector = affected.TestSelector(Index(), max_changes=2)  # type: ignore
+    selector.record(mapping(), [True])
+    selector.record(mapping("a", "b", "c"), [True])
+
+    assert selector.select(mapping("a", "b", "c", "d")) == ["test_d.py"]
+    assert selector.select(mapping("b")) == ["test_b.py"]
+    assert selector.select(mapping("a", "b", "c")) == []
+    # too far from both
+    assert selector.select(mapping("a", "d", "e")) is None
+
+
+def test_remembers_the_latest():
+    selector = affected.TestSelector(Index(), max_changes=0, remember=2)  # type: ignore
+
+    for newer in ["a", "b", "c"]:
+        selector.record(mapping(newer), [True])
+
+    assert selector.select(mapping("a")) is None
+    assert selector.select(mapping("c")) == []
+
+
+def test_select_while_recording():
+    selector = affected.TestSelector(Index(), max_changes=1, remember=2000)  # type: ignore
+    selector.record(mapping(), [True])
+
+    def work(i: int):
+        if i % 2:
+            selector.record(mapping("abcde"[i % 5]), [True])
+
+        return selector.select(mapping("a"))
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(work, range(2000)))
+
+    assert all(res in (["test_a.py"], []) for res in results)
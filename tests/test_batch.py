@@ -0,0 +1,74 @@
+import io
+import json
+from pathlib import Path
+
+from pydep import batch
+
+CONFIG = {
+    "dependencies": {
+        "a": {"versions": ["1.0", "1.1", "2.0"], "specifier": "", "iniver": "2.0"},
+    },
+    "tests": [{"true_when": [{"a": ["1.0", "1.1"]}]}],
+}
+
+
+def lines(*items) -> io.StringIO:
+    return io.StringIO("".join(f"{item}\n" for item in items))
+
+
+def test_json_lines_cases():
+    named = dict(CONFIG, name="named")
+    stdin = lines(json.dumps(CONFIG), "", json.dumps(named))
+
+    cases = list(batch.iter_cases(Path("-"), stdin))
+
+    assert [name for name, _ in cases] == ["1", "named"]
+    assert all(case == CONFIG for _, case in cases)
+
+
+def test_bad_lines_are_yielded_as_they_are():
+    stdin = lines("{not json", "[1, 2]", "3", json.dumps(CONFIG))
+
+    cases = list(batch.iter_cases(Path("-"), stdin))
+
+    assert cases[:3] == [("1", "{not json\n"), ("2", "[1, 2]\n"), ("3", "3\n")]
+    assert cases[3] == ("4", CONFIG)
+
+
+def test_bad_lines_are_errors_of_their_own_case():
+    for line in ["{not json", "[1, 2]", "null"]:
+        res = batch.solve_case(("1", line), "Backtrack", 10)
+
+        assert res["status"] == "error"
+        assert res["name"] == "1"
+        assert res["error"]
+
+    res = batch.solve_case(("2", json.dumps(CONFIG)), "Backtrack", 10)
+    assert res["status"] == "solved"
+    assert res["mapping"] == {"a": "1.1"}
+
+
+def test_directory_and_single_files(tmp_path: Path):
+    (tmp_path / "b.toml").write_text("")
+    (tmp_path / "a.case.jsonl").write_text("")
+    (tmp_path / "ignored.jsonl").write_text("")
+
+    assert [name for name, _ in batch.iter_cases(tmp_path)] == [
+        "a.case.jsonl",
+        "b.toml",
+    ]
+    assert list(batch.iter_cases(tmp_path / "b.toml")) == [
+        ("b.toml", tmp_path / "b.toml")
+    ]
+
+
+def test_run_batch_counts_errors():
+    cases = batch.iter_cases(Path("-"), lines(json.dumps(CONFIG), "[]", "{"))
+    out = io.StringIO()
+
+    errors = batch.run_batch(cases, "Backtrack", 10, out, workers=1)
+
+    results = {res["name"]: res for res in map(json.loads, out.getvalue().splitlines())}
+    assert errors == 2
+    assert results["1"]["status"] == "solved"
+    assert results["2"]["status"] == results["3"]["status"] == "error"
@@ -0,0 +1,83 @@
+from packaging.requirements import Requirement
+from packaging.version import Version
+
+from pydep import costs, opts
+from pydep import tests as runners
+from pydep.algorithms import Bisect
+from pydep.deps import Dependency
+
+
+class Fails(runners.Test):
+    """Fails when `broken` tells so, counting the evaluations."""
+
+    def __init__(self, broken) -> None:
+        self.broken = broken
+        self.runs = 0
+
+    def run(self, pinned_vers) -> bool:
+        self.runs += 1
+        return not self.broken(pinned_vers)
+
+
+def dep(name: str, n: int = 10) -> Dependency:
+    return Dependency(name, [Version(f"1.{i}") for i in range(n)], Requirement(name))
+
+
+def bisect(deps, broken, **kwargs) -> Bisect:
+    return Bisect(
+        deps,
+        runners.LinearRunner([Fails(broken)]),
+        costs.Sum(costs.version_to_float),
+        opts.Max(),
+        inimapping={dep: dep.spversions[-1] for dep in deps},
+        **kwargs,
+    )
+
+
+def test_ddmin_finds_the_culprits():
+    deps = [dep(name) for name in "abcdefgh"]
+    a, c, f = deps[0], deps[2], deps[5]
+
+    # only breaks when a and f both changed, whatever c does
+    bis = bisect(deps, lambda m: m[a] != a.spversions[0] and m[f] != f.spversions[0])
+    bis.target = dict(bis.inimapping)
+
+    assert sorted(bis.ddmin(deps), key=deps.index) == [a, f]
+
+    bis = bisect(deps, lambda m: m[c] != c.spversions[0])
+    bis.target = dict(bis.inimapping)
+
+    assert bis.ddmin(deps) == [c]
+
+
+def test_search_finds_the_first_failing_version():
+    a, b = dep("a", 100), dep("b")
+    bis = bisect([a, b], lambda m: m[a] >= Version("1.37"))
+    bis.target = dict(bis.inimapping)
+    test = bis.runner.tests[0]
+
+    assert bis.search(a, bis.apply([])) == (Version("1.36"), Version("1.37"))
+    # a binary search, not a scan
+    assert test.runs <= 8
+
+
+def test_run_keeps_everything_but_the_culprit():
+    a, b = dep("a"), dep("b")
+    bis = bisect([a, b], lambda m: m[a] > Version("1.5"))
+
+    cost, mapping = bis.run()
+
+    assert mapping == {a: Version("1.5"), b: Version("1.9")}
+    assert bis.culprits == {a: (Version("1.5"), Version("1.6"))}
+
+
+def test_run_without_a_passing_good_mapping():
+    a, b = dep("a"), dep("b")
+    # the oldest versions, the default good mapping, fail too
+    broken = lambda m: m[a] > Version("1.5") or m[b] == Version("1.0")
+    bis = bisect([a, b], broken)
+
+    cost, mapping = bis.run()
+
+    assert not broken(mapping)
+    assert mapping[a] <= Version("1.5")
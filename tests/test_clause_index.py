@@ -0,0 +1,80 @@
+import random
+
+from packaging.requirements import Requirement
+from packaging.version import Version
+
+from pydep import tests as runners
+from pydep.deps import Dependency
+from pydep.versions import VersionRange
+
+
+def scan(true_when, pinned_vers) -> int:
+    """The clauses holding for `pinned_vers`, checked one by one."""
+
+    mask = 0
+    for i, conditions in enumerate(true_when):
+        if all(
+            rng.min <= pinned_vers[dep] <= rng.max for dep, rng in conditions.items()
+        ):
+            mask |= 1 << i
+
+    return mask
+
+
+def random_range(rng: random.Random, versions) -> VersionRange:
+    lo, hi = sorted(rng.choices(versions, k=2))
+    return VersionRange(lo, hi)
+
+
+def test_matches_a_linear_scan():
+    rng = random.Random(0)
+    deps = [
+        Dependency(
+            name,
+            [Version(f"{i}.{j}") for i in range(1, 5) for j in range(3)],
+            Requirement(name),
+        )
+        for name in "abcd"
+    ]
+    # bounds between, and outside, the versions too
+    bounds = [Version(f"{i}.{j}.5") for i in range(6) for j in range(3)]
+
+    for _ in range(50):
+        true_when = [
+            {
+                dep: random_range(rng, dep.versions + bounds)
+                for dep in rng.sample(deps, rng.randint(0, len(deps)))
+            }
+            for _ in range(rng.randint(1, 40))
+        ]
+        index = runners.ClauseIndex(true_when)
+
+        for _ in range(50):
+            # versions of the dependency, looked up by rank, and others
+            pinned_vers = {
+                dep: (
+                    rng.choice(dep.versions)
+                    if rng.random() < 0.8
+                    else Version(str(rng.choice(bounds)))
+                )
+                for dep in deps
+            }
+
+            assert index.matches(pinned_vers) == scan(true_when, pinned_vers)
+
+
+def test_virtual_test_with_and_without_index():
+    dep = Dependency("a", [Version(f"1.{i}") for i in range(40)], Requirement("a"))
+    true_when = [
+        {dep: VersionRange(Version(f"1.{i}"), Version(f"1.{i}"))}
+        for i in range(0, 40, 2)
+    ]
+    indexed = runners.VirtualTest(true_when)
+    linear = runners.VirtualTest(true_when[: runners.VirtualTest.INDEX_MIN_CLAUSES - 1])
+
+    for ver in dep.versions:
+        assert indexed.run({dep: ver}) == (int(str(ver).split(".")[1]) % 2 == 0)
+        assert linear.run({dep: ver}) == (scan(linear.true_when, {dep: ver}) != 0)
+
+    assert indexed._index is not None
+    assert linear._index is None
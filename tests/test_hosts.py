@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from pydep.hosts import DockerHost, HostPool
+
+
+def fail(pool: HostPool, host: DockerHost, times: int):
+    for _ in range(times):
+        host.running += 1
+        pool.release(host, "FROM x", failed=True)
+
+
+def test_prefers_the_host_that_built_the_dockerfile():
+    a, b = DockerHost("a", 2), DockerHost("b", 2)
+    pool = HostPool([a, b])
+
+    host = pool.acquire("FROM y")
+    pool.release(host, "FROM y")
+
+    assert pool.acquire("FROM y") is host
+    assert pool.acquire("FROM y") is host
+    # it is full now
+    assert pool.acquire("FROM y") is not host
+
+
+def test_quarantine_after_failures_in_a_row():
+    a, b = DockerHost("a"), DockerHost("b")
+    pool = HostPool([a, b], max_failures=3, cooldown=100)
+
+    fail(pool, a, 2)
+    pool.release(pool.acquire("FROM x", [b]), "FROM x")
+    fail(pool, a, 2)
+
+    # a success resets the count
+    assert a.quarantined_until == 0
+
+    start = time.monotonic()
+    fail(pool, a, 1)
+
+    assert start + 100 <= a.quarantined_until <= time.monotonic() + 100
+    assert pool.acquire("FROM x") is b
+
+
+@pytest.mark.parametrize("failures, cooldown", [(1, 20), (2, 40), (6, 640), (10, 640)])
+def test_backoff_doubles_up_to_a_limit(failures, cooldown):
+    a, b = DockerHost("a"), DockerHost("b")
+    pool = HostPool([a, b], max_failures=1, cooldown=10)
+
+    fail(pool, a, failures)
+    a.quarantined_until = 0
+    start = time.monotonic()
+    fail(pool, a, 1)
+
+    assert start + cooldown <= a.quarantined_until <= time.monotonic() + cooldown
+
+
+def test_retry_gives_up_when_every_other_host_is_quarantined():
+    a, b = DockerHost("a"), DockerHost("b")
+    pool = HostPool([a, b], max_failures=1, cooldown=100)
+
+    fail(pool, b, 1)
+    host = pool.acquire("FROM x")
+
+    assert host is a
+    assert pool.acquire("FROM x", [a]) is None
+
+
+def test_needs_a_host():
+    with pytest.raises(ValueError):
+        HostPool([])
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from pydep import opts
+
+
+def dominates(a, b, senses) -> bool:
+    return all(s * p >= s * q for s, p, q in zip(senses, a, b))
+
+
+def brute_front(costs, senses):
+    return {
+        cost
+        for cost in costs
+        if not any(other != cost and dominates(other, cost, senses) for other in costs)
+    }
+
+
+@pytest.mark.parametrize("senses", [(1, -1), (-1, 1), (1, 1), (1, -1, 1), (-1, -1, 1)])
+def test_front_is_the_non_dominated_points(senses):
+    rng = random.Random(len(senses))
+
+    for _ in range(20):
+        pareto = opts.Pareto(senses)
+        costs = [
+            tuple(rng.randint(0, 30) + rng.random() for _ in senses) for _ in range(200)
+        ]
+
+        for cost in costs:
+            pareto.relax(cost, {"cost": cost})
+
+        front = [cost for cost, _ in pareto.front]
+        assert set(front) == brute_front(costs, senses)
+        assert len(front) == len(set(front))
+
+        # best on the first objective first, and `optimum` is that one
+        firsts = [senses[0] * cost[0] for cost in front]
+        assert firsts == sorted(firsts, reverse=True)
+        assert pareto.optimum == pareto.front[0]
+        assert all(mapping == {"cost": cost} for cost, mapping in pareto.front)
+
+
+@pytest.mark.parametrize("senses", [(1, -1), (1, -1, 1)])
+def test_dominated_and_equal_points_are_rejected(senses):
+    pareto = opts.Pareto(senses)
+    best = tuple(10 * s for s in senses)
+    worse = tuple(5 * s for s in senses)
+
+    pareto.relax(best, {"first": 1})
+    pareto.relax(worse, {})
+    pareto.relax(best, {"again": 1})
+
+    assert pareto.front == [(best, {"first": 1})]
+
+
+def test_insertion_removes_the_points_it_dominates():
+    pareto = opts.Pareto((1, -1))
+
+    for cost in [(1, 1), (2, 2), (3, 3), (4, 4)]:
+        pareto.relax(cost, {})
+
+    assert [cost for cost, _ in pareto.front] == [(4, 4), (3, 3), (2, 2), (1, 1)]
+
+    # better than (2, 2) and (3, 3) on both
+    pareto.relax((3, 1.5), {})
+
+    assert [cost for cost, _ in pareto.front] == [(4, 4), (3, 1.5), (1, 1)]
+
+
+def test_empty_front_has_no_optimum():
+    with pytest.raises(opts.NotSolutionException):
+        opts.Pareto().optimum
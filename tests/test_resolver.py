@@ -0,0 +1,65 @@
+from packaging.requirements import Requirement
+from packaging.version import Version
+import pytest
+
+from pydep.deps import Dependency
+from pydep.resolver import ResolutionConflict, Resolver
+
+
+class Cache:
+    """The `Requires-Dist` of some releases, the others require nothing."""
+
+    def __init__(self, requires) -> None:
+        self.requires = requires
+
+    def fetch_requires(self, releases):
+        return {rel: self.requires.get(rel, []) for rel in releases}
+
+
+def dep(name: str, *versions: str) -> Dependency:
+    return Dependency(name, [Version(ver) for ver in versions], Requirement(name))
+
+
+APP = dep("app", "1.0", "2.0")
+LIB = dep("Lib_Core", "1.0", "2.0", "2.1", "3.0")
+PLUGIN = dep("plugin", "1.0", "2.0")
+WINONLY = dep("winonly", "1.0", "2.0")
+
+REQUIRES = {
+    ("app", "1.0"): ["lib-core<2", "winonly>1; sys_platform == 'win32'"],
+    ("app", "2.0"): ["lib-core>=2,<3", "not a requirement!"],
+    ("plugin", "1.0"): ["app<2"],
+    ("plugin", "2.0"): ["app>=2"],
+}
+
+
+def resolver(*transitive: Dependency) -> Resolver:
+    initial = {dep: dep.versions[0] for dep in transitive}
+    return Resolver(initial, Cache(REQUIRES), "3.9.7")  # type: ignore
+
+
+def test_keeps_the_installed_versions_that_fit():
+    res = resolver(LIB, WINONLY).resolve({APP: Version("1.0")})
+
+    assert res == {LIB: Version("1.0"), WINONLY: Version("1.0")}
+
+
+def test_moves_the_others_to_the_newest_allowed():
+    res = resolver(LIB, WINONLY).resolve({APP: Version("2.0")})
+
+    assert res == {LIB: Version("2.1"), WINONLY: Version("1.0")}
+
+
+def test_moves_a_transitive_dependency_excluding_a_top_level_version():
+    res = resolver(LIB, PLUGIN).resolve({APP: Version("2.0")})
+
+    assert res == {LIB: Version("2.1"), PLUGIN: Version("2.0")}
+
+
+def test_conflict():
+    # no plugin allows app 2.0
+    requires = {**REQUIRES, ("plugin", "2.0"): ["app<1"]}
+    res = Resolver({PLUGIN: Version("1.0")}, Cache(requires), "3.9.7")  # type: ignore
+
+    with pytest.raises(ResolutionConflict):
+        res.resolve({APP: Version("2.0")})
@@ -0,0 +1,92 @@
+import docker.errors
+
+from pydep.scheduler import ImageLRU
+
+
+class API:
+    def __init__(self, sizes) -> None:
+        self.sizes = sizes
+
+    def inspect_image(self, tag):
+        return {"Size": self.sizes[tag]}
+
+
+class Images:
+    def __init__(self) -> None:
+        self.removed = []
+        self.busy = set()
+
+    def remove(self, tag):
+        if tag in self.busy:
+            raise docker.errors.APIError("image is being used by a container")
+
+        self.removed.append(tag)
+
+
+class Client:
+    def __init__(self, sizes) -> None:
+        self.api = API(sizes)
+        self.images = Images()
+
+
+def build(lru: ImageLRU, tag: str, release: bool = True):
+    lru.reserve(tag)
+    lru.use(tag)
+
+    if release:
+        lru.release(tag)
+
+
+def test_evicts_the_least_recently_used():
+    client = Client({"base": 100, "a": 110, "b": 120, "c": 130})
+    lru = ImageLRU(client, 40, "base")  # type: ignore
+
+    build(lru, "a")
+    build(lru, "b")
+    # used again, so b is the oldest now
+    build(lru, "a")
+    build(lru, "c")
+
+    assert client.images.removed == ["b"]
+    assert lru.images == {"a": 10, "c": 30}
+
+
+def test_keeps_images_in_use():
+    client = Client({"base": 100, "a": 130, "b": 130})
+    lru = ImageLRU(client, 40, "base")  # type: ignore
+
+    build(lru, "a", release=False)
+    build(lru, "b")
+
+    assert client.images.removed == ["b"]
+
+    build(lru, "b", release=False)
+    assert client.images.removed == ["b"]
+
+    # over the budget until one of them is released
+    lru.release("a")
+    assert client.images.removed == ["b", "a"]
+    assert list(lru.images) == ["b"]
+
+
+def test_keeps_images_it_cannot_remove():
+    client = Client({"base": 100, "a": 130, "b": 130})
+    client.images.busy.add("a")
+    lru = ImageLRU(client, 40, "base")  # type: ignore
+
+    build(lru, "a")
+    build(lru, "b")
+
+    assert client.images.removed == ["b"]
+    assert list(lru.images) == ["a"]
+
+
+def test_no_budget_keeps_everything():
+    client = Client({"base": 100, "a": 1000, "b": 1000})
+    lru = ImageLRU(client, None, "base")  # type: ignore
+
+    build(lru, "a")
+    build(lru, "b")
+
+    assert client.images.removed == []
+    assert lru.users == {}